@@ -0,0 +1,153 @@
+import asyncio
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Optional
+
+from database import QueryCancelled
+
+# Filtered /rows counts to keep; 0 turns the count cache off
+COUNT_CACHE_SIZE = int(os.getenv("COUNT_CACHE_SIZE", "1024"))
+# Memory for cached /rows and /diff responses, measured as their JSON size; 0 turns it off
+RESULT_CACHE_MB = float(os.getenv("RESULT_CACHE_MB", "64"))
+
+class LRUCache:
+    """Thread-safe mapping that forgets its least recently used entries past max_entries."""
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, predicate):
+        """Drops every entry whose key matches predicate."""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": _hit_rate(self.hits, self.misses)}
+
+class ResultCache:
+    """
+    LRU cache of endpoint responses bounded by their JSON size. Identical requests that
+    arrive while one is running wait for its result instead of querying again. Entries
+    are tagged with the snapshots they read, so a write to a snapshot drops them.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        # key -> (value, size, snapshot_ids)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # key -> Future of the running computation
+        self._flights = {}
+        # Bumped by every invalidation; results computed across one are not stored
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_compute(self, key, compute, snapshot_ids=()) -> tuple:
+        """
+        (value, cached) for key, awaiting compute() only if no entry or running call has
+        it. Requests that joined a call whose client went away run it themselves.
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0], True
+                flight = self._flights.get(key)
+                if flight is None:
+                    flight = self._flights[key] = Future()
+                    generation = self._generation
+                    self.misses += 1
+                    break
+                self.coalesced += 1
+            try:
+                # Shielded, so a waiter giving up doesn't cancel the call for the others
+                return await asyncio.shield(asyncio.wrap_future(flight)), True
+            except QueryCancelled as e:
+                if e.timed_out:
+                    raise
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+
+        try:
+            value = await compute()
+            size = len(json.dumps(value, default=str))
+        except BaseException as e:
+            with self._lock:
+                del self._flights[key]
+            if isinstance(e, Exception):
+                flight.set_exception(e)
+            else:
+                flight.cancel()
+            raise
+        with self._lock:
+            del self._flights[key]
+            if generation == self._generation:
+                self._store(key, value, size, snapshot_ids)
+        flight.set_result(value)
+        return value, False
+
+    def _store(self, key, value, size: int, snapshot_ids):
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size, frozenset(snapshot_ids))
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+
+    def invalidate(self, snapshot_id: int):
+        with self._lock:
+            self._generation += 1
+            for key in [key for key, entry in self._entries.items() if snapshot_id in entry[2]]:
+                self._bytes -= self._entries.pop(key)[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits,
+                    "misses": self.misses, "coalesced": self.coalesced,
+                    "hit_rate": _hit_rate(self.hits + self.coalesced, self.misses)}
+
+def _hit_rate(hits: int, misses: int) -> Optional[float]:
+    return round(hits / (hits + misses), 3) if hits + misses else None
+
+# (snapshot_id, row_count, filters) -> count. Every write to a snapshot's rows also
+# updates its row_count, so entries of a changed snapshot simply stop matching
+count_cache = LRUCache(COUNT_CACHE_SIZE)
+result_cache = ResultCache(int(RESULT_CACHE_MB * 1024 * 1024))
+
+def invalidate_snapshot(snapshot_id: int):
+    """Forgets cached results that read a snapshot, after it was created, changed or deleted."""
+    result_cache.invalidate(snapshot_id)
+    count_cache.discard(lambda key: key[0] == snapshot_id)
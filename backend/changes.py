@@ -0,0 +1,118 @@
+from typing import Optional
+
+from storage import snapshot_prices
+
+# Statuses stored in snapshot_changes; unchanged domains are not stored
+CHANGE_STATUSES = ("NEW", "DELETED", "CHANGED")
+
+def previous_snapshot(con, snapshot_id: int) -> Optional[int]:
+    row = con.execute(
+        "SELECT max(id) FROM snapshots WHERE id < ? AND status = 'completed'", [snapshot_id]
+    ).fetchone()
+    return row[0]
+
+def record_changes(con, snapshot_id: int) -> Optional[int]:
+    """
+    Stores the NEW / DELETED / CHANGED rows of a completed snapshot against the
+    previous completed one in snapshot_changes, and links it through parent_id.
+    Replaces any change set the snapshot already had. Returns the parent id.
+    """
+    parent_id = previous_snapshot(con, snapshot_id)
+    con.execute("DELETE FROM snapshot_changes WHERE snapshot_id = ?", [snapshot_id])
+    con.execute("UPDATE snapshots SET parent_id = ? WHERE id = ?", [parent_id, snapshot_id])
+    if parent_id is None:
+        return None
+
+    old_rows, old_params = snapshot_prices(con, parent_id)
+    new_rows, new_params = snapshot_prices(con, snapshot_id)
+    # Compared on ids and prices alone; names are only looked up for the changed domains
+    con.execute(f"""
+        INSERT INTO snapshot_changes (snapshot_id, domain_id, domain, old_price, new_price, status)
+        SELECT ?, c.domain_id, d.name, c.old_price, c.new_price, c.status
+        FROM (
+            SELECT
+                COALESCE(a.domain_id, b.domain_id) AS domain_id,
+                a.price_usd AS old_price,
+                b.price_usd AS new_price,
+                CASE
+                    WHEN a.domain_id IS NULL THEN 'NEW'
+                    WHEN b.domain_id IS NULL THEN 'DELETED'
+                    ELSE 'CHANGED'
+                END AS status
+            FROM {old_rows} a
+            FULL OUTER JOIN {new_rows} b
+            ON a.domain_id = b.domain_id
+            -- Price changes to and from NULL are kept too, so change sets compose exactly
+            WHERE a.domain_id IS NULL OR b.domain_id IS NULL OR a.price_usd IS DISTINCT FROM b.price_usd
+        ) c
+        JOIN domains d ON d.id = c.domain_id
+        ORDER BY d.name
+    """, [snapshot_id, *old_params, *new_params])
+    return parent_id
+
+def change_chain(con, snapshot_a: int, snapshot_b: int) -> Optional[list]:
+    """
+    Snapshots whose stored change sets lead from A to B by following parent_id back
+    from B, oldest first, or None if A is not an ancestor of B.
+    """
+    chain = []
+    current = snapshot_b
+    while current != snapshot_a:
+        row = con.execute("SELECT parent_id FROM snapshots WHERE id = ?", [current]).fetchone()
+        if row is None or row[0] is None or row[0] < snapshot_a:
+            return None
+        chain.append(current)
+        current = row[0]
+    return chain[::-1]
+
+def composed_changes(chain: list) -> tuple[str, list]:
+    """
+    SQL relation of (domain_id, domain, old_price, new_price, status) for the net change
+    over a chain of change sets, with its parameters. A domain keeps its price until a
+    change set mentions it, so its A side comes from the first set that lists it and
+    its B side from the last one. Like the snapshot join in /diff, a price that is NULL
+    on either side does not count as changed.
+    """
+    if len(chain) == 1:
+        return ("""(
+            SELECT domain_id, domain, old_price, new_price, status
+            FROM snapshot_changes
+            WHERE snapshot_id = ? AND (status != 'CHANGED' OR old_price != new_price)
+        )""", chain)
+    placeholders = ", ".join("?" for _ in chain)
+    return (f"""(
+        SELECT domain_id, domain, old_price, new_price,
+            CASE
+                WHEN NOT in_a THEN 'NEW'
+                WHEN NOT in_b THEN 'DELETED'
+                ELSE 'CHANGED'
+            END AS status
+        FROM (
+            SELECT
+                domain_id,
+                last(domain ORDER BY snapshot_id) AS domain,
+                first(old_price ORDER BY snapshot_id) AS old_price,
+                last(new_price ORDER BY snapshot_id) AS new_price,
+                first(status ORDER BY snapshot_id) != 'NEW' AS in_a,
+                last(status ORDER BY snapshot_id) != 'DELETED' AS in_b
+            FROM snapshot_changes
+            WHERE snapshot_id IN ({placeholders})
+            GROUP BY domain_id
+        )
+        -- Drops domains that were added and removed again, or changed back, along the way
+        WHERE in_a != in_b OR (in_a AND old_price != new_price)
+    )""", chain)
+
+if __name__ == "__main__":
+    # Backfills change sets for snapshots created before snapshot_changes existed
+    import time
+    from database import get_db, init_db
+
+    init_db()
+    with get_db() as con:
+        snapshot_ids = [r[0] for r in con.execute("SELECT id FROM snapshots WHERE status = 'completed' ORDER BY id").fetchall()]
+        for snapshot_id in snapshot_ids:
+            start_time = time.time()
+            parent_id = record_changes(con, snapshot_id)
+            count = con.execute("SELECT count(*) FROM snapshot_changes WHERE snapshot_id = ?", [snapshot_id]).fetchone()[0]
+            print(f"Snapshot {snapshot_id}: {count} changes since {parent_id} ({time.time() - start_time:.2f}s)")
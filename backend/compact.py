@@ -0,0 +1,156 @@
+import os
+import time
+from typing import Optional
+
+import duckdb
+
+from database import DB_PATH, create_schema, get_connection, init_db, replace_database
+
+# Copied in this order into the fresh file. Rows of snapshots that no longer exist are
+# dropped, snapshot_data is rewritten as one domain_id-sorted run per snapshot, and only
+# domains still referenced by some snapshot, version or change set are kept, along with
+# their trigrams.
+COPY_PLAN = [
+    ("snapshots", "SELECT * FROM snapshots ORDER BY id"),
+    ("snapshot_data", """
+        SELECT * FROM snapshot_data
+        WHERE snapshot_id IN (SELECT id FROM snapshots)
+        ORDER BY snapshot_id, domain_id
+    """),
+    ("domain_versions", "SELECT * FROM domain_versions ORDER BY domain_id, valid_from"),
+    ("snapshot_changes", """
+        SELECT * FROM snapshot_changes
+        WHERE snapshot_id IN (SELECT id FROM snapshots)
+        ORDER BY snapshot_id, domain
+    """),
+    ("scrape_checkpoints", "SELECT * FROM scrape_checkpoints WHERE snapshot_id IN (SELECT id FROM snapshots)"),
+    ("scrape_staging", "SELECT * FROM scrape_staging WHERE snapshot_id IN (SELECT id FROM snapshots) ORDER BY snapshot_id"),
+    ("domains", """
+        SELECT * FROM domains
+        WHERE id IN (
+            SELECT domain_id FROM compacted.snapshot_data
+            UNION SELECT domain_id FROM compacted.domain_versions
+            UNION SELECT domain_id FROM compacted.snapshot_changes
+        )
+        ORDER BY id
+    """),
+    ("domain_trigrams", """
+        SELECT DISTINCT trigram, domain_id FROM domain_trigrams
+        WHERE domain_id IN (SELECT id FROM compacted.domains)
+        ORDER BY trigram, domain_id
+    """),
+]
+# Creating the schema, one step per table, checkpointing and the swap
+TOTAL_STEPS = len(COPY_PLAN) + 3
+
+class CompactionState:
+    def __init__(self):
+        self.is_running: bool = False
+        self.status: str = "idle"
+        self.step: int = 0
+        self.total_steps: int = TOTAL_STEPS
+        self.size_before: Optional[int] = None
+        self.size_after: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def stats(self) -> dict:
+        return {
+            "is_running": self.is_running,
+            "status": self.status,
+            "step": self.step,
+            "total_steps": self.total_steps,
+            "size_before": self.size_before,
+            "size_after": self.size_after,
+            "error": self.error,
+        }
+
+compaction_state = CompactionState()
+
+def _file_size(path: str) -> int:
+    return sum(os.path.getsize(p) for p in (path, path + ".wal") if os.path.exists(p))
+
+def _report(state: CompactionState, step: int, status: str):
+    state.step = step
+    state.status = status
+    print(f"[compact {step}/{state.total_steps}] {status}")
+
+def _remove_file(path: str):
+    for p in (path, path + ".wal"):
+        if os.path.exists(p):
+            os.remove(p)
+
+def compact_database(state: CompactionState = compaction_state) -> dict:
+    """
+    Rewrites the database into a fresh file next to it and swaps that in, reclaiming
+    the space DuckDB keeps after deletes and garbage-collecting unreferenced domains.
+    Reads keep working from the old file while it copies; callers must keep writers
+    out until it returns. Progress is reported on `state`. Returns state.stats().
+    """
+    state.is_running = True
+    state.error = None
+    state.size_after = None
+    state.size_before = _file_size(DB_PATH)
+    new_path = DB_PATH + ".compact"
+    start_time = time.time()
+    con = get_connection().cursor()
+    attached = False
+    try:
+        _remove_file(new_path)
+        _report(state, 1, "Creating schema")
+        # Sequences continue where the old file left off, so ids are never reused
+        sequences = con.execute("""
+            SELECT sequence_name, COALESCE(last_value + 1, start_value)
+            FROM duckdb_sequences()
+            WHERE database_name = current_database()
+        """).fetchall()
+        new_con = duckdb.connect(new_path)
+        try:
+            for name, start in sequences:
+                new_con.execute(f"CREATE SEQUENCE {name} START {start}")
+            create_schema(new_con)
+        finally:
+            new_con.close()
+
+        con.execute(f"ATTACH '{new_path.replace(chr(39), chr(39) * 2)}' AS compacted")
+        attached = True
+        for step, (table, query) in enumerate(COPY_PLAN, start=2):
+            table_start = time.time()
+            _report(state, step, f"Copying {table}")
+            copied = con.execute(f"INSERT INTO compacted.{table} BY NAME {query}").fetchone()[0]
+            total = con.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+            print(f"    {copied:,} of {total:,} rows kept ({time.time() - table_start:.2f}s)")
+
+        _report(state, len(COPY_PLAN) + 2, "Checkpointing")
+        con.execute("CHECKPOINT compacted")
+        con.execute("DETACH compacted")
+        attached = False
+        con.close()
+        con = None
+
+        _report(state, len(COPY_PLAN) + 3, "Swapping in the compacted file")
+        replace_database(new_path)
+        state.size_after = _file_size(DB_PATH)
+        state.status = "completed"
+        print(f"SUCCESS: Compacted {DB_PATH} from {state.size_before / 1024 / 1024:.1f} MB to "
+              f"{state.size_after / 1024 / 1024:.1f} MB in {time.time() - start_time:.2f} seconds!")
+    except Exception as e:
+        state.status = "failed"
+        state.error = str(e)
+        print(f"ERROR: Compaction failed, the database was left as it was: {e}")
+        if con is not None:
+            if attached:
+                con.execute("DETACH compacted")
+            con.close()
+        _remove_file(new_path)
+        raise
+    finally:
+        state.is_running = False
+    return state.stats()
+
+if __name__ == "__main__":
+    # Run while the API server is stopped: DuckDB lets only one process open the file
+    init_db()
+    try:
+        compact_database()
+    except Exception:
+        raise SystemExit(1)
@@ -0,0 +1,120 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+class AdaptiveLimiter:
+    """
+    AIMD limit on in-flight requests. Outcomes are collected per window of `window`
+    requests: a window with too many 403/429s or errors, or with latency well above
+    the best window seen (and at least `latency_slack` seconds above it), cuts the
+    limit by `decrease`; a clean window that actually used the limit raises it by
+    `increase`.
+    """
+    def __init__(self, initial: int = 40, min_limit: int = 4, max_limit: int = 160,
+                 window: int = 20, increase: int = 2, decrease: float = 0.5,
+                 max_block_rate: float = 0.1, latency_factor: float = 2.0,
+                 latency_slack: float = 1.0):
+        self.limit = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.window = window
+        self.increase = increase
+        self.decrease = decrease
+        self.max_block_rate = max_block_rate
+        self.latency_factor = latency_factor
+        self.latency_slack = latency_slack
+
+        self.in_flight: int = 0
+        self._cond = asyncio.Condition()
+
+        self._outcomes = {"ok": 0, "blocked": 0, "error": 0}
+        self._latency_total: float = 0.0
+        self._peak_in_flight: int = 0
+        self.best_latency: float = 0.0
+        self.last_latency: float = 0.0
+        self.increases: int = 0
+        self.decreases: int = 0
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self.in_flight)
+
+    async def release(self):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            await self.release()
+
+    def record(self, status_code, latency: float):
+        """Feeds one request outcome; status_code is None for a transport error."""
+        if status_code in (403, 429):
+            self._outcomes["blocked"] += 1
+        elif status_code is None or status_code >= 500:
+            self._outcomes["error"] += 1
+        else:
+            self._outcomes["ok"] += 1
+        self._latency_total += latency
+
+        if sum(self._outcomes.values()) >= self.window:
+            self._adjust()
+
+    def _adjust(self):
+        total = sum(self._outcomes.values())
+        bad_rate = (self._outcomes["blocked"] + self._outcomes["error"]) / total
+        avg_latency = self._latency_total / total
+        self.last_latency = avg_latency
+        if self._outcomes["ok"] and (self.best_latency == 0.0 or avg_latency < self.best_latency):
+            self.best_latency = avg_latency
+
+        slow = (self.best_latency > 0
+                and avg_latency > self.best_latency * self.latency_factor
+                and avg_latency - self.best_latency > self.latency_slack)
+        if bad_rate > self.max_block_rate or slow:
+            self.limit = max(self.min_limit, int(self.limit * self.decrease))
+            self.decreases += 1
+        elif self._peak_in_flight >= self.limit:
+            self.limit = min(self.max_limit, self.limit + self.increase)
+            self.increases += 1
+
+        self._outcomes = {"ok": 0, "blocked": 0, "error": 0}
+        self._latency_total = 0.0
+        self._peak_in_flight = self.in_flight
+        # Waiters may now fit under a raised limit
+        asyncio.get_running_loop().create_task(self._wake())
+
+    async def _wake(self):
+        async with self._cond:
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "window_latency_s": round(self.last_latency, 3),
+            "best_latency_s": round(self.best_latency, 3),
+        }
+
+@asynccontextmanager
+async def timed_request(limiter: AdaptiveLimiter):
+    """
+    Holds a limiter slot for one request and records its outcome. The body sets
+    outcome["status"] to the HTTP status; an exception is recorded as an error.
+    """
+    outcome = {"status": None}
+    async with limiter.slot():
+        started = time.monotonic()
+        try:
+            yield outcome
+        finally:
+            limiter.record(outcome["status"], time.monotonic() - started)
@@ -1,8 +1,13 @@
+import contextvars
 import duckdb
 import os
 import sys
 import shutil
+import threading
 from contextlib import contextmanager
+from typing import Optional
+
+from trigram import catch_up
 
 def get_resource_path(relative_path):
     try:
@@ -33,6 +38,72 @@ def setup_persistent_db():
 DB_PATH = os.getenv("DB_PATH", setup_persistent_db())
 _global_con = None
 
+class ConnectionGate:
+    """Lets get_db() users share the connection, and replace_database() wait until they are done."""
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._users = 0
+        self._closed = False
+
+    def enter(self):
+        with self._cond:
+            while self._closed:
+                self._cond.wait()
+            self._users += 1
+
+    def leave(self):
+        with self._cond:
+            self._users -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            self._closed = True
+            while self._users:
+                self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._closed = False
+                self._cond.notify_all()
+
+_gate = ConnectionGate()
+
+class QueryCancelled(Exception):
+    """A query lane (see lanes.py) interrupted a request's queries."""
+    def __init__(self, reason: str, timed_out: bool):
+        super().__init__(reason)
+        self.timed_out = timed_out
+
+class QueryTicket:
+    """Cursors one lane request is running queries on, so the lane can interrupt them."""
+    def __init__(self):
+        self.cancelled: Optional[QueryCancelled] = None
+        self._cursors = []
+        self._lock = threading.Lock()
+
+    def attach(self, con):
+        with self._lock:
+            if self.cancelled is not None:
+                raise self.cancelled
+            self._cursors.append(con)
+
+    def detach(self, con):
+        with self._lock:
+            self._cursors.remove(con)
+
+    def cancel(self, error: QueryCancelled):
+        with self._lock:
+            self.cancelled = error
+            for con in self._cursors:
+                con.interrupt()
+
+# Ticket of the lane request running on this thread, None outside lanes
+current_ticket = contextvars.ContextVar("current_ticket", default=None)
+_lane_cursors = threading.local()
+
 def get_connection():
     global _global_con
     if _global_con is None:
@@ -44,7 +115,15 @@ def get_connection():
 def init_db():
     """Initializes the DuckDB database with the required schema."""
     con = get_connection()
-    
+    create_schema(con)
+    # Builds the trigram index on first start, and indexes domains a failed write left out
+    indexed = catch_up(con)
+    if indexed:
+        print(f"Indexed {indexed:,} domain trigrams.")
+    print("Database initialized successfully.")
+
+def create_schema(con):
+    """Creates any missing tables, columns, sequences and indexes on con."""
     try:
         con.execute("CREATE SEQUENCE IF NOT EXISTS snapshot_seq START 1")
     except Exception:
@@ -63,41 +142,156 @@ def init_db():
         )
     """)
 
+    # Trigrams of every domain name, for contains searches (see trigram.py)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS domain_trigrams (
+            trigram VARCHAR,
+            domain_id INTEGER
+        )
+    """)
+
     con.execute("""
         CREATE TABLE IF NOT EXISTS snapshots (
             id INTEGER DEFAULT nextval('snapshot_seq') PRIMARY KEY,
             name VARCHAR NOT NULL,
             created_at TIMESTAMP DEFAULT current_timestamp,
-            row_count BIGINT DEFAULT 0
+            row_count BIGINT DEFAULT 0,
+            status VARCHAR DEFAULT 'completed',
+            parent_id INTEGER,
+            storage VARCHAR DEFAULT 'full'
         )
     """)
+    # 'in_progress' while a scrape is still publishing into the snapshot
+    con.execute("ALTER TABLE snapshots ADD COLUMN IF NOT EXISTS status VARCHAR DEFAULT 'completed'")
+    # Snapshot that snapshot_changes compares this one against
+    con.execute("ALTER TABLE snapshots ADD COLUMN IF NOT EXISTS parent_id INTEGER")
+    # 'full' rows live in snapshot_data, 'versioned' ones in domain_versions (see storage.py)
+    con.execute("ALTER TABLE snapshots ADD COLUMN IF NOT EXISTS storage VARCHAR DEFAULT 'full'")
 
     con.execute("""
         CREATE TABLE IF NOT EXISTS snapshot_data (
             snapshot_id INTEGER,
             domain_id INTEGER,
-            domain VARCHAR,
+            price_usd DECIMAL(12,2)
+        )
+    """)
+    # snapshot_data has no ART indexes: every snapshot is written as one run sorted by
+    # domain_id, so zone maps already skip the other snapshots' row groups, and maintaining
+    # the indexes cost more on each bulk insert than they saved on reads. They go before
+    # the columns below, which DuckDB won't drop while an index depends on them
+    for index in ("idx_domain", "idx_snapshot", "idx_snap_domain", "idx_sd_domain_id"):
+        con.execute(f"DROP INDEX IF EXISTS {index}")
+    # Name and length live only in domains; older databases repeated them on every row
+    con.execute("ALTER TABLE snapshot_data DROP COLUMN IF EXISTS domain")
+    con.execute("ALTER TABLE snapshot_data DROP COLUMN IF EXISTS length")
+    
+    # Prices of versioned snapshots: valid for snapshot ids valid_from <= id < valid_to (NULL = open)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS domain_versions (
+            domain_id INTEGER,
             price_usd DECIMAL(12,2),
-            length INTEGER
+            valid_from INTEGER,
+            valid_to INTEGER
         )
     """)
     
-    con.execute("CREATE INDEX IF NOT EXISTS idx_domain ON snapshot_data(domain)")
-    con.execute("CREATE INDEX IF NOT EXISTS idx_snapshot ON snapshot_data(snapshot_id)")
-    con.execute("CREATE INDEX IF NOT EXISTS idx_snap_domain ON snapshot_data(snapshot_id, domain)")
-    con.execute("CREATE INDEX IF NOT EXISTS idx_sd_domain_id ON snapshot_data(domain_id)")
+    # What changed in each completed snapshot since its parent, written when it completes
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS snapshot_changes (
+            snapshot_id INTEGER,
+            domain_id INTEGER,
+            domain VARCHAR,
+            old_price DECIMAL(12,2),
+            new_price DECIMAL(12,2),
+            status VARCHAR
+        )
+    """)
     
-    print("Database initialized successfully.")
+    # Cursor of every (length, sort channel) stream of a scrape, so it can be resumed
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS scrape_checkpoints (
+            snapshot_id INTEGER,
+            length INTEGER,
+            band VARCHAR NOT NULL DEFAULT '',
+            sort_direction VARCHAR,
+            start_index INTEGER,
+            next_token VARCHAR,
+            done BOOLEAN DEFAULT false,
+            abandoned BOOLEAN DEFAULT false,
+            updated_at TIMESTAMP DEFAULT current_timestamp,
+            PRIMARY KEY (snapshot_id, length, band, sort_direction)
+        )
+    """)
+    # Set for a stream that stopped before its end (302 or an empty page): it never counts
+    # as having covered its partition, and a resume walks it again from the first page
+    con.execute("ALTER TABLE scrape_checkpoints ADD COLUMN IF NOT EXISTS abandoned BOOLEAN DEFAULT false")
+    
+    # Rows of a running scrape, merged into domains / snapshot_data when it finishes
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS scrape_staging (
+            snapshot_id INTEGER,
+            domain VARCHAR,
+            price_usd DOUBLE,
+            length INTEGER
+        )
+    """)
+    
+    con.execute("CREATE INDEX IF NOT EXISTS idx_changes_snapshot ON snapshot_changes(snapshot_id)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_versions_domain ON domain_versions(domain_id)")
+
+def replace_database(new_path):
+    """
+    Swaps the database file for new_path in one rename. Waits for open get_db()
+    connections to finish and holds new ones back until the new file is open.
+    """
+    global _global_con
+    with _gate.exclusive():
+        if _global_con is not None:
+            # Closing checkpoints the WAL, so the old one can go before the rename
+            _global_con.close()
+            _global_con = None
+        if os.path.exists(DB_PATH + ".wal"):
+            os.remove(DB_PATH + ".wal")
+        os.replace(new_path, DB_PATH)
+        get_connection()
+
+def _lane_cursor():
+    """The calling lane thread's own cursor, reopened once replace_database() closed its connection."""
+    con = get_connection()
+    pooled = getattr(_lane_cursors, "pooled", None)
+    if pooled is None or pooled[0] is not con:
+        pooled = _lane_cursors.pooled = (con, con.cursor())
+    return pooled[1]
 
 @contextmanager
 def get_db():
-    """Yields a thread-safe connection clone for FastAPI endpoints and Scraper."""
+    """
+    Yields a thread-safe connection clone for FastAPI endpoints and Scraper. On a query
+    lane thread it is the thread's pooled cursor, which the lane may interrupt.
+    """
     # DuckDB threading is best when each thread clones the main connection
-    con = get_connection().cursor()
+    _gate.enter()
     try:
-        yield con
+        ticket = current_ticket.get()
+        if ticket is None:
+            con = get_connection().cursor()
+            try:
+                yield con
+            finally:
+                con.close()
+        else:
+            con = _lane_cursor()
+            ticket.attach(con)
+            try:
+                yield con
+            except duckdb.InterruptException:
+                if ticket.cancelled is None:
+                    raise
+                raise ticket.cancelled from None
+            finally:
+                ticket.detach(con)
     finally:
-        con.close()
+        _gate.leave()
 
 if __name__ == "__main__":
     init_db()
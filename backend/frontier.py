@@ -0,0 +1,76 @@
+import re
+from typing import Optional
+
+# Sort channels that walk the same ordering from opposite ends
+OPPOSITE = {"PriceAsc": "PriceDesc", "PriceDesc": "PriceAsc", "NameAsc": "NameDesc", "NameDesc": "NameAsc"}
+AXIS = {"PriceAsc": "price", "PriceDesc": "price", "NameAsc": "name", "NameDesc": "name"}
+
+def _price(value) -> Optional[float]:
+    if value is None or isinstance(value, (int, float)):
+        return value
+    digits = re.sub(r'[^\d.]', '', value)
+    try:
+        return float(digits) if digits else None
+    except ValueError:
+        return None
+
+class PartitionFrontier:
+    """
+    Shared progress of the sort channels of one partition (a length and price band).
+
+    The price pair has crossed once the highest price PriceAsc fetched is strictly above
+    the lowest PriceDesc fetched: every domain is then on one side or the other, even
+    with ties at the edge. Name order has no value we can compare with the site's
+    collation, so the name pair has crossed once a page contains a domain from the
+    opposite channel's latest page. Either crossing, or any channel running to the end
+    of its ordering, means the whole partition has been fetched and all four channels
+    can stop.
+    """
+    def __init__(self, finished=()):
+        self.finished: set = set(finished)
+        self.crossed: set = set()
+        self.price_edge: dict = {}
+        self.name_page: dict = {}
+        self.rows_fetched: int = 0
+        self.duplicate_rows: int = 0
+
+    @property
+    def complete(self) -> bool:
+        return bool(self.crossed or self.finished)
+
+    def finish(self, sort_direction: str):
+        """Marks a channel that walked its ordering to the end."""
+        self.finished.add(sort_direction)
+
+    def advance(self, sort_direction: str, rows, duplicates: int = 0) -> bool:
+        """
+        Records a fetched page of (domain, price, ...) rows. Returns True if the channel
+        met its opposite on this page, i.e. the stream can stop after saving it.
+        """
+        self.rows_fetched += len(rows)
+        self.duplicate_rows += duplicates
+        axis = AXIS[sort_direction]
+        if axis == "price":
+            prices = [p for p in (_price(row[1]) for row in rows) if p is not None]
+            if sort_direction in self.price_edge:
+                prices.append(self.price_edge[sort_direction])
+            if prices:
+                self.price_edge[sort_direction] = max(prices) if sort_direction == "PriceAsc" else min(prices)
+            low, high = self.price_edge.get("PriceAsc"), self.price_edge.get("PriceDesc")
+            crossed = low is not None and high is not None and low > high
+        else:
+            names = {row[0] for row in rows}
+            crossed = not names.isdisjoint(self.name_page.get(OPPOSITE[sort_direction], ()))
+            self.name_page[sort_direction] = names
+        if crossed:
+            self.crossed.add(axis)
+        return crossed
+
+def duplicate_stats(frontiers) -> dict:
+    fetched = sum(f.rows_fetched for f in frontiers)
+    duplicates = sum(f.duplicate_rows for f in frontiers)
+    return {
+        "rows_fetched": fetched,
+        "duplicate_rows": duplicates,
+        "duplicate_ratio": round(duplicates / fetched, 3) if fetched else 0.0,
+    }
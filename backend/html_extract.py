@@ -0,0 +1,227 @@
+import codecs
+import os
+import re
+from html import unescape
+from typing import Optional
+from bs4 import BeautifulSoup
+
+# "fast" is a targeted tokenizer for the HugeDomains result markup, "bs4" is the
+# reference implementation kept as a fallback. Both return raw (domain, price) strings.
+DEFAULT_ENGINE = os.getenv("HTML_PARSER_ENGINE", "fast")
+
+NEXT_TOKEN_RE = re.compile(r'n=([^&"]+)')
+
+# Tag openers matched on a class token, the same way the CSS selectors match them
+_ROW_RE = re.compile(r'<div\s[^>]*?class="(?:[^"]*\s)?domain-row(?:\s[^"]*)?"[^>]*>')
+_DOMAIN_SPAN_RE = re.compile(r'<span\s[^>]*?class="(?:[^"]*\s)?domain(?:\s[^"]*)?"[^>]*>')
+_LINK_RE = re.compile(r'<a\s[^>]*?class="(?:[^"]*\s)?link(?:\s[^"]*)?"[^>]*>(.*?)</a>', re.S)
+_PRICE_RE = re.compile(r'<span\s[^>]*?class="(?:[^"]*\s)?price(?:\s[^"]*)?"[^>]*>(.*?)</span>', re.S)
+_NEXT_LINK_RE = re.compile(r'<a\s[^>]*?class="(?:[^"]*\s)?(?:next-link|next-serch-link)(?:\s[^"]*)?"[^>]*>')
+_HREF_RE = re.compile(r'\shref="([^"]*)"')
+_TAG_RE = re.compile(r'<[^>]*>')
+_PAGE_COUNT_RE = re.compile(r'Page\s+[\d,]+\s+of\s+([\d,]+)')
+
+def _text(fragment: str) -> str:
+    if '<' in fragment:
+        fragment = _TAG_RE.sub('', fragment)
+    if '&' in fragment:
+        fragment = unescape(fragment)
+    return fragment.strip()
+
+def parse_row(chunk: str) -> Optional[tuple[str, str]]:
+    """Extracts (domain, price) from the markup of a single domain-row."""
+    span = _DOMAIN_SPAN_RE.search(chunk)
+    if not span:
+        return None
+    link = _LINK_RE.search(chunk, span.end())
+    if not link:
+        return None
+    price = _PRICE_RE.search(chunk, link.end())
+    if not price:
+        return None
+    return _text(link.group(1)), _text(price.group(1))
+
+def parse_next_link(tag: str) -> Optional[str]:
+    """Returns the 'n' cursor from the opening tag of a Next button."""
+    href = _HREF_RE.search(tag)
+    if not href:
+        return None
+    match = NEXT_TOKEN_RE.search(unescape(href.group(1)))
+    return match.group(1) if match else None
+
+def parse_page_count(html_content: str) -> Optional[int]:
+    """Returns N from the "Page X of N" banner above the results."""
+    match = _PAGE_COUNT_RE.search(html_content)
+    return int(match.group(1).replace(',', '')) if match else None
+
+def extract_fast(html_content: str):
+    rows = []
+    starts = [m.start() for m in _ROW_RE.finditer(html_content)]
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else len(html_content)
+        row = parse_row(html_content[start:end])
+        if row:
+            rows.append(row)
+
+    next_token = None
+    next_link = _NEXT_LINK_RE.search(html_content)
+    if next_link:
+        next_token = parse_next_link(next_link.group(0))
+    return rows, next_token
+
+def extract_bs4(html_content: str):
+    soup = BeautifulSoup(html_content, "html.parser")
+    rows = []
+    for row in soup.find_all("div", class_="domain-row"):
+        domain_link = row.select_one("span.domain > a.link")
+        price_span = row.select_one("span.domain > span.price")
+        if domain_link and price_span:
+            rows.append((domain_link.text.strip(), price_span.text.strip()))
+
+    next_token = None
+    next_link = soup.select_one("a.next-link, a.next-serch-link")
+    if next_link and next_link.has_attr('href'):
+        match = NEXT_TOKEN_RE.search(next_link['href'])
+        if match:
+            next_token = match.group(1)
+    return rows, next_token
+
+class StreamingExtractor:
+    """
+    Incremental version of extract_fast for a body that arrives in chunks. Only the
+    markup of the row currently being received is buffered, and the page is marked
+    complete as soon as the Next link shows up after the rows, so the page footer is
+    never parsed.
+    """
+    def __init__(self):
+        self.next_token: Optional[str] = None
+        self.page_count: Optional[int] = None
+        self.complete: bool = False
+        self.rows_seen: int = 0
+        self._buffer = ""
+        self._in_row = False # buffer starts at a domain-row opener
+        self._scan_from = 0
+
+    def _find_next_token(self):
+        next_link = _NEXT_LINK_RE.search(self._buffer, self._scan_from)
+        if next_link:
+            self.next_token = parse_next_link(next_link.group(0))
+            return next_link.start()
+        # A tag may be cut at the chunk boundary, resume at its opening bracket
+        self._scan_from = max(self._buffer.rfind('<'), 0)
+        return None
+
+    def _flush_row(self, chunk: str, rows: list):
+        row = parse_row(chunk)
+        if row:
+            rows.append(row)
+            self.rows_seen += 1
+
+    def feed(self, text: str) -> list:
+        """Adds decoded text and returns the rows completed by it."""
+        rows = []
+        if self.complete:
+            return rows
+        self._buffer += text
+
+        next_link_pos = self._find_next_token() if self.next_token is None else None
+        if next_link_pos is not None and self._in_row:
+            # Pagination after the rows: everything we need has arrived
+            openers = [m.start() for m in _ROW_RE.finditer(self._buffer, 0, next_link_pos)]
+            for start, end in zip(openers, openers[1:] + [next_link_pos]):
+                self._flush_row(self._buffer[start:end], rows)
+            self._buffer = ""
+            self.complete = True
+            return rows
+
+        openers = [m.start() for m in _ROW_RE.finditer(self._buffer)]
+        if openers:
+            for start, end in zip(openers, openers[1:]):
+                self._flush_row(self._buffer[start:end], rows)
+            cut = openers[-1]
+            self._in_row = True
+        elif not self._in_row:
+            # Page header; keep only a possibly truncated trailing tag
+            if self.page_count is None:
+                self.page_count = parse_page_count(self._buffer)
+            cut = max(self._buffer.rfind('<'), 0)
+        else:
+            cut = 0
+        if cut:
+            self._buffer = self._buffer[cut:]
+            self._scan_from = max(self._scan_from - cut, 0)
+        return rows
+
+    def close(self) -> list:
+        """Flushes the last row once the body has been fully received."""
+        rows = []
+        if not self.complete:
+            if self.next_token is None:
+                self._find_next_token()
+            if self.page_count is None and not self._in_row:
+                self.page_count = parse_page_count(self._buffer)
+            if self._in_row:
+                self._flush_row(self._buffer, rows)
+            self._buffer = ""
+            self.complete = True
+        return rows
+
+async def extract_response_stream(response, engine: Optional[str] = None):
+    """
+    Reads a streamed curl_cffi response chunk by chunk, returning (rows, next_token,
+    page_count), where page_count is N from a "Page X of N" banner seen before the rows.
+    Only the fast engine parses incrementally; other engines get the whole body.
+    """
+    decoder = codecs.getincrementaldecoder(response.charset_encoding or "utf-8")(errors="replace")
+    name = engine or DEFAULT_ENGINE
+    if name != "fast":
+        text = "".join([decoder.decode(chunk) async for chunk in response.aiter_content()]) + decoder.decode(b"", final=True)
+        rows, next_token = extract_rows(text, name)
+        return rows, next_token, parse_page_count(text)
+    extractor = StreamingExtractor()
+    rows = []
+    async for chunk in response.aiter_content():
+        rows.extend(extractor.feed(decoder.decode(chunk)))
+        if extractor.complete:
+            break
+    else:
+        rows.extend(extractor.feed(decoder.decode(b"", final=True)))
+    rows.extend(extractor.close())
+    return rows, extractor.next_token, extractor.page_count
+
+ENGINES = {
+    "fast": extract_fast,
+    "bs4": extract_bs4,
+}
+
+def extract_rows(html_content: str, engine: Optional[str] = None):
+    """Returns ([(domain, price), ...], next_token) using the configured parser engine."""
+    name = engine or DEFAULT_ENGINE
+    if name not in ENGINES:
+        raise ValueError(f"Unknown HTML parser engine '{name}' (expected one of: {', '.join(ENGINES)})")
+    return ENGINES[name](html_content)
+
+def normalize_rows(raw_rows):
+    """Maps raw (domain, price) strings to (domain_name, price_numeric, name_length)."""
+    normalized = []
+    for domain_text, price_text in raw_rows:
+        domain_name = domain_text.lower()
+        try:
+            price_clean = re.sub(r'[^\d.]', '', price_text)
+            price_numeric = float(price_clean) if price_clean else None
+        except ValueError:
+            price_numeric = None
+
+        name_parts = domain_name.split('.')
+        name_length = len(name_parts[0]) if name_parts else len(domain_name)
+
+        normalized.append((domain_name, price_numeric, name_length))
+    return normalized
+
+def parse_page(html_content: str, engine: Optional[str] = None):
+    """
+    Extracts and normalizes a result page. Kept free of database imports so it can be
+    shipped to worker processes.
+    """
+    raw_rows, next_token = extract_rows(html_content, engine)
+    return normalize_rows(raw_rows), next_token
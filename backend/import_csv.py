@@ -1,115 +1,207 @@
-import duckdb
 import argparse
-import time
+import csv
+import glob
 import os
+import time
 
-from database import DB_PATH
+from database import get_connection, init_db
+from changes import record_changes
+from storage import store_completed
+from trigram import domain_watermark, index_domains
 
-def import_csv(csv_path: str, snapshot_name: str):
+# Header layouts the importer understands: the site export ("Domain,Price" with "$1,234.00"
+# strings) and the scraper's CSV output. Columns are typed up front instead of sniffed.
+LAYOUTS = {
+    ("domain", "price"): {
+        "columns": {"domain": "VARCHAR", "price": "VARCHAR"},
+        "price": "CAST(NULLIF(REPLACE(REPLACE(price, '$', ''), ',', ''), '') AS DECIMAL(12,2))",
+        "length": "LENGTH(SPLIT_PART(LOWER(TRIM(domain)), '.', 1))",
+    },
+    ("domain_name", "price_numeric", "length_numeric"): {
+        "columns": {"domain": "VARCHAR", "price": "DOUBLE", "length": "INTEGER"},
+        "price": "CAST(price AS DECIMAL(12,2))",
+        "length": "COALESCE(length, LENGTH(SPLIT_PART(LOWER(TRIM(domain)), '.', 1)))",
+    },
+}
+# Files parsed per read_csv call; DuckDB spreads a multi-file read over all cores
+FILES_PER_BATCH = os.cpu_count() or 4
+
+def expand_paths(paths) -> list:
+    """Files named by paths, globs and directories (their *.csv), in order, without repeats."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = sorted(glob.glob(os.path.join(path, "*.csv")))
+        elif glob.has_magic(path):
+            matches = sorted(glob.glob(path))
+        else:
+            matches = [path]
+        for match in matches:
+            if match not in files:
+                files.append(match)
+    return files
+
+def detect_layout(path: str) -> dict:
+    with open(path, newline="", encoding="utf-8") as file:
+        header = next(csv.reader(file), [])
+    key = tuple(column.strip().lower() for column in header)
+    if key not in LAYOUTS:
+        raise ValueError(f"Unknown CSV header {','.join(header)!r} in {path}")
+    return LAYOUTS[key]
+
+def stage_files(con, files: list, layout: dict):
     """
-    Imports a large CSV file directly into DuckDB using vectorized SQL queries.
-    This guarantees memory efficiency and immense speed.
+    Parses files of one layout into the import_staging temp table in a single read.
+    A domain listed more than once in a file is staged once, with its lowest price.
     """
-    if not os.path.exists(csv_path):
-        print(f"Error: Could not find CSV file at {csv_path}")
-        return False
-        
-    start_time = time.time()
-    
-    # Needs WRITING connection, so we don't open as read_only=True
-    con = duckdb.connect(DB_PATH)
-    
-    # 1. Ensure schema exists (in case it didn't)
-    try:
-        con.execute("CREATE SEQUENCE IF NOT EXISTS snapshot_seq START 1")
-    except:
-        pass
-        
-    con.execute("""
-        CREATE TABLE IF NOT EXISTS snapshots (
-            id INTEGER DEFAULT nextval('snapshot_seq') PRIMARY KEY,
-            name VARCHAR NOT NULL,
-            created_at TIMESTAMP DEFAULT current_timestamp,
-            row_count BIGINT DEFAULT 0
+    columns = ", ".join(f"'{name}': '{sql_type}'" for name, sql_type in layout["columns"].items())
+    con.execute(f"""
+        INSERT INTO import_staging
+        SELECT filename, domain, price_usd, length
+        FROM (
+            SELECT
+                filename,
+                LOWER(TRIM(domain)) AS domain,
+                {layout['price']} AS price_usd,
+                {layout['length']} AS length
+            FROM read_csv(?, header = true, auto_detect = false, columns = {{{columns}}}, filename = true)
+            WHERE domain IS NOT NULL AND TRIM(domain) != ''
         )
-    """)
+        QUALIFY row_number() OVER (PARTITION BY filename, domain ORDER BY price_usd NULLS LAST) = 1
+    """, [files])
 
+def import_staged(con, path: str, snapshot_name: str) -> tuple[int, int]:
+    """
+    Turns the staged rows of one file into a snapshot, in one transaction: the snapshot
+    only becomes visible, and the versions it closes only change, once it has fully
+    loaded. Returns (snapshot_id, row_count).
+    """
+    con.execute("BEGIN TRANSACTION")
     try:
-        con.execute("CREATE SEQUENCE IF NOT EXISTS domain_seq START 1")
-    except:
-        pass
+        con.execute("INSERT INTO snapshots (name) VALUES (?)", [snapshot_name])
+        snap_id = con.execute("SELECT currval('snapshot_seq')").fetchone()[0]
+        watermark = domain_watermark(con)
+        con.execute("""
+            INSERT INTO domains (name, length)
+            SELECT DISTINCT domain, length
+            FROM import_staging
+            WHERE filename = ?
+            ON CONFLICT (name) DO NOTHING
+        """, [path])
+        index_domains(con, watermark)
+        con.execute("""
+            INSERT INTO snapshot_data (snapshot_id, domain_id, price_usd)
+            SELECT ?, d.id, s.price_usd
+            FROM import_staging s
+            JOIN domains d ON d.name = s.domain
+            WHERE s.filename = ?
+            ORDER BY d.id
+        """, [snap_id, path])
 
-    con.execute("""
-        CREATE TABLE IF NOT EXISTS domains (
-            id INTEGER DEFAULT nextval('domain_seq') PRIMARY KEY,
-            name VARCHAR UNIQUE,
-            length INTEGER
-        )
-    """)
+        count = con.execute("SELECT COUNT(*) FROM snapshot_data WHERE snapshot_id = ?", [snap_id]).fetchone()[0]
+        con.execute("UPDATE snapshots SET row_count = ? WHERE id = ?", [count, snap_id])
+
+        # Store what changed since the previous snapshot, for /diff
+        record_changes(con, snap_id)
+        store_completed(con, snap_id)
+        con.execute("COMMIT")
+    except Exception:
+        # Also undoes the versions store_completed closed
+        con.execute("ROLLBACK")
+        raise
+    return snap_id, count
+
+def bulk_import(paths, snapshot_name: str = None) -> bool:
+    """
+    Imports every CSV named by paths as its own snapshot, named after the file (or
+    `snapshot_name` for a single file). Files are parsed a batch at a time with one
+    multi-file read each, then turned into snapshots oldest first in the given order,
+    so change sets and versions line up with the file order.
+    """
+    files = expand_paths(paths)
+    missing = [path for path in files if not os.path.exists(path)]
+    if missing or not files:
+        print(f"Error: Could not find CSV file(s): {', '.join(missing) or ', '.join(paths)}")
+        return False
+    if snapshot_name and len(files) > 1:
+        print("Error: --name only applies to a single file")
+        return False
 
+    init_db()
+    con = get_connection()
+    con.execute(f"PRAGMA threads={os.cpu_count() or 4}")
     con.execute("""
-        CREATE TABLE IF NOT EXISTS snapshot_data (
-            snapshot_id INTEGER,
-            domain_id INTEGER,
+        CREATE OR REPLACE TEMP TABLE import_staging (
+            filename VARCHAR,
             domain VARCHAR,
             price_usd DECIMAL(12,2),
             length INTEGER
         )
     """)
-    
-    # 2. Insert new Snapshot ID
-    print(f"Creating snapshot entry for '{snapshot_name}'...")
-    con.execute("INSERT INTO snapshots (name) VALUES (?)", [snapshot_name])
-    snap_id = con.execute("SELECT currval('snapshot_seq')").fetchone()[0]
-    
-    # 3. FAST Vectorized Bulk Import
-    print(f"Starting bulk import into database for snapshot_id={snap_id}...")
-    try:
-        # 3.1 Extract Unique Domains
-        con.execute(f"""
-        INSERT INTO domains (name, length)
-        SELECT DISTINCT LOWER(TRIM(Domain)), LENGTH(SPLIT_PART(LOWER(TRIM(Domain)), '.', 1))
-        FROM read_csv_auto('{csv_path}', header=True)
-        WHERE Domain IS NOT NULL AND Domain != ''
-        ON CONFLICT (name) DO NOTHING;
-        """)
-
-        # 3.2 Insert Snapshot Data mapped to Domain IDs
-        query = f"""
-        INSERT INTO snapshot_data (snapshot_id, domain_id, domain, price_usd, length)
-        SELECT 
-            {snap_id} as snapshot_id,
-            d.id as domain_id,
-            LOWER(TRIM(csv.Domain)) as domain,
-            CAST(REPLACE(REPLACE(csv.Price, '$', ''), ',', '') AS DECIMAL(12,2)) as price_usd,
-            d.length as length
-        FROM read_csv_auto('{csv_path}', header=True) csv
-        JOIN domains d ON d.name = LOWER(TRIM(csv.Domain))
-        WHERE csv.Domain IS NOT NULL AND csv.Domain != '';
-        """
-        con.execute(query)
-        
-        # 4. Update row count metadata
-        count = con.execute(f"SELECT COUNT(*) FROM snapshot_data WHERE snapshot_id = {snap_id}").fetchone()[0]
-        con.execute(f"UPDATE snapshots SET row_count = ? WHERE id = ?", [count, snap_id])
-        
-        elapsed = time.time() - start_time
-        print(f"SUCCESS: Imported {count} rows in {elapsed:.2f} seconds!")
-        
-    except Exception as e:
-        print(f"ERROR during import: {str(e)}")
-        # Delete the broken snapshot metadata if fails
-        con.execute(f"DELETE FROM snapshots WHERE id = {snap_id}")
-        return False
-    finally:
-        con.close()
-        
-    return True
+
+    start_time = time.time()
+    total_rows = 0
+    failed = 0
+    for batch_start in range(0, len(files), FILES_PER_BATCH):
+        batch = files[batch_start:batch_start + FILES_PER_BATCH]
+        parse_start = time.time()
+        by_layout = {}
+        for path in batch:
+            try:
+                layout = detect_layout(path)
+            except (ValueError, UnicodeDecodeError) as e:
+                print(f"ERROR: {e}")
+                failed += 1
+                continue
+            by_layout.setdefault(id(layout), (layout, []))[1].append(path)
+        readable = []
+        for layout, layout_files in by_layout.values():
+            try:
+                stage_files(con, layout_files, layout)
+                readable.extend(layout_files)
+            except Exception:
+                # A failed read stages nothing; retry file by file so one bad file doesn't sink the batch
+                for path in layout_files:
+                    try:
+                        stage_files(con, [path], layout)
+                        readable.append(path)
+                    except Exception as e:
+                        print(f"ERROR while reading {path}: {e}")
+                        failed += 1
+        parse_time = time.time() - parse_start
+        staged = dict(con.execute("SELECT filename, count(*) FROM import_staging GROUP BY filename").fetchall())
+        batch_rows = sum(staged.values()) or 1
+
+        for path in sorted(readable, key=batch.index):
+            file_start = time.time()
+            name = snapshot_name or os.path.splitext(os.path.basename(path))[0]
+            try:
+                snap_id, count = import_staged(con, path, name)
+            except Exception as e:
+                print(f"ERROR during import of {path}: {e}")
+                failed += 1
+                continue
+            # Each file is charged its share of the batch's parse time
+            elapsed = time.time() - file_start + parse_time * staged.get(path, 0) / batch_rows
+            total_rows += count
+            print(f"{path} -> snapshot {snap_id} '{name}': {count} rows in {elapsed:.2f}s "
+                  f"({count / elapsed if elapsed else 0:,.0f} rows/s)")
+        con.execute("DELETE FROM import_staging")
+
+    elapsed = time.time() - start_time
+    print(f"{'SUCCESS' if not failed else 'DONE'}: Imported {total_rows} rows from {len(files) - failed} of "
+          f"{len(files)} file(s) in {elapsed:.2f} seconds ({total_rows / elapsed if elapsed else 0:,.0f} rows/s)!")
+    return failed == 0
+
+def import_csv(csv_path: str, snapshot_name: str):
+    """Imports one CSV file as a snapshot named snapshot_name."""
+    return bulk_import([csv_path], snapshot_name)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="DuckDB Fast CSV Importer")
-    parser.add_argument("csv_path", help="Path to the Domains CSV file to import")
-    parser.add_argument("--name", required=True, help="Snapshot Name (e.g. '2023-11-Scraping')")
-    
+    parser.add_argument("paths", nargs="+", help="CSV files, globs or directories to import, oldest first")
+    parser.add_argument("--name", help="Snapshot name for a single file (default: the file name)")
+
     args = parser.parse_args()
-    import_csv(args.csv_path, args.name)
+    if not bulk_import(args.paths, args.name):
+        raise SystemExit(1)
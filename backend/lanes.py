@@ -0,0 +1,141 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from database import QueryCancelled, QueryTicket, current_ticket
+
+# Concurrent queries and timeout in seconds (queueing included) of each API lane. Cheap
+# metadata reads get their own lane, so slow /rows, /diff or exports never hold them up
+LIGHT_QUERY_SLOTS = int(os.getenv("LIGHT_QUERY_SLOTS", "4"))
+LIGHT_QUERY_TIMEOUT = float(os.getenv("LIGHT_QUERY_TIMEOUT", "10"))
+HEAVY_QUERY_SLOTS = int(os.getenv("HEAVY_QUERY_SLOTS", "2"))
+HEAVY_QUERY_TIMEOUT = float(os.getenv("HEAVY_QUERY_TIMEOUT", "60"))
+# How often a waiting request checks its deadline and whether its client is still there
+POLL_SECONDS = 0.1
+QUEUE_WAIT_HEADER = "X-Queue-Wait-Ms"
+
+class QueryLane:
+    """
+    Runs endpoint queries on a fixed number of threads, each keeping its own cursor.
+    Requests past the slots wait in the lane's queue without tying up a server thread,
+    and are interrupted once they outlive the timeout or their client disconnects.
+    """
+    def __init__(self, name: str, slots: int, timeout: float):
+        self.name = name
+        self.slots = slots
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=slots, thread_name_prefix=f"{name}-lane")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.started = 0
+        self.timeouts = 0
+        self.disconnects = 0
+        self.queue_ms_total = 0.0
+        self.queue_ms_max = 0.0
+
+    async def run(self, request, fn, *args):
+        """
+        Result of fn(*args) run on a lane thread, where get_db() hands out cursors the
+        lane can interrupt. The time spent queued is stored on request.state.queue_ms.
+        Raises QueryCancelled on a timeout or disconnect.
+        """
+        ticket = QueryTicket()
+        submitted = time.perf_counter()
+
+        def work():
+            queue_ms = (time.perf_counter() - submitted) * 1000
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self.started += 1
+                self.queue_ms_total += queue_ms
+                self.queue_ms_max = max(self.queue_ms_max, queue_ms)
+            if request is not None:
+                request.state.queue_ms = queue_ms
+            current_ticket.set(ticket)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+        with self._lock:
+            self.queued += 1
+        # A copied context keeps the ticket from leaking into the thread's next request
+        future = self._executor.submit(contextvars.copy_context().run, work)
+        waiter = asyncio.wrap_future(future)
+        deadline = submitted + self.timeout
+        while not waiter.done():
+            await asyncio.wait({waiter}, timeout=POLL_SECONDS)
+            if waiter.done():
+                break
+            if time.perf_counter() >= deadline:
+                error = QueryCancelled(f"Query timed out after {self.timeout:g}s in the {self.name} lane", timed_out=True)
+            elif request is not None and await request.is_disconnected():
+                error = QueryCancelled("Client disconnected", timed_out=False)
+            else:
+                continue
+            with self._lock:
+                if error.timed_out:
+                    self.timeouts += 1
+                else:
+                    self.disconnects += 1
+            if future.cancel():
+                # Never started, so it was still counted as queued
+                with self._lock:
+                    self.queued -= 1
+                if request is not None:
+                    request.state.queue_ms = (time.perf_counter() - submitted) * 1000
+            else:
+                ticket.cancel(error)
+                # Keep the slot until the interrupted query has actually stopped
+                await asyncio.wait({waiter})
+                waiter.exception()
+            raise error
+
+        try:
+            return waiter.result()
+        except Exception:
+            # The function may have turned the interrupt into an error of its own
+            if ticket.cancelled is not None:
+                raise ticket.cancelled from None
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "timeout_seconds": self.timeout,
+                "running": self.running,
+                "queued": self.queued,
+                "started": self.started,
+                "timeouts": self.timeouts,
+                "disconnects": self.disconnects,
+                "avg_queue_ms": round(self.queue_ms_total / self.started, 2) if self.started else None,
+                "max_queue_ms": round(self.queue_ms_max, 2),
+            }
+
+light_lane = QueryLane("light", LIGHT_QUERY_SLOTS, LIGHT_QUERY_TIMEOUT)
+heavy_lane = QueryLane("heavy", HEAVY_QUERY_SLOTS, HEAVY_QUERY_TIMEOUT)
+
+class QueueWaitMiddleware:
+    """Reports how long a request waited for a lane slot in the X-Queue-Wait-Ms response header."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_queue_wait(message):
+            queue_ms = scope.get("state", {}).get("queue_ms")
+            if message["type"] == "http.response.start" and queue_ms is not None:
+                message["headers"] = list(message.get("headers", [])) + [(QUEUE_WAIT_HEADER.lower().encode(), f"{queue_ms:.2f}".encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_queue_wait)
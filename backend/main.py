@@ -1,13 +1,25 @@
 from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
 import time
 import asyncio
 import os
 import sys
-from database import get_db, init_db
+import tempfile
+import duckdb
+from database import get_db, init_db, QueryCancelled
 from scraper_service import run_scraper_engine, stop_scraper_engine, scraper_state
+from frontier import duplicate_stats
+from snapshot_io import export_snapshot, import_snapshot
+from changes import change_chain, composed_changes, record_changes
+from storage import snapshot_rows, snapshot_prices, domain_prices, versioned_diff, is_versioned, remove_snapshot
+from compact import compact_database, compaction_state
+from pagination import order_by, encode_cursor, decode_cursor, keyset_condition
+from cache import count_cache, result_cache, invalidate_snapshot
+from trigram import contains_matches
+from lanes import light_lane, heavy_lane, QueueWaitMiddleware, QUEUE_WAIT_HEADER
 
 app = FastAPI(title="HugeDomains Tracker API")
 
@@ -18,7 +30,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[QUEUE_WAIT_HEADER],
 )
+app.add_middleware(QueueWaitMiddleware)
+
+@app.exception_handler(QueryCancelled)
+def query_cancelled_handler(request: Request, e: QueryCancelled):
+    # 499 is what nginx logs for a client that closed the connection; nobody reads it here
+    return JSONResponse(status_code=504 if e.timed_out else 499, content={"detail": str(e)})
 
 @app.on_event("startup")
 def startup_event():
@@ -30,11 +49,14 @@ def read_root():
     return {"message": "Welcome to HugeDomains Tracker API", "status": "running"}
 
 @app.get("/snapshots")
-def get_snapshots():
+async def get_snapshots(request: Request):
     """Returns a list of all available snapshots."""
+    return await light_lane.run(request, list_snapshots)
+
+def list_snapshots() -> dict:
     try:
         with get_db() as con:
-            result = con.execute("SELECT id, name, created_at, row_count FROM snapshots ORDER BY id DESC").fetchall()
+            result = con.execute("SELECT id, name, created_at, row_count, status FROM snapshots ORDER BY id DESC").fetchall()
             
             snapshots = []
             for row in result:
@@ -42,7 +64,8 @@ def get_snapshots():
                     "id": row[0],
                     "name": row[1],
                     "created_at": row[2],
-                    "row_count": row[3]
+                    "row_count": row[3],
+                    "status": row[4]
                 })
             return {"snapshots": snapshots}
     except Exception as e:
@@ -51,17 +74,92 @@ def get_snapshots():
 @app.delete("/snapshots/{snapshot_id}")
 def delete_snapshot(snapshot_id: int):
     """Deletes a snapshot and its associated data."""
+    if compaction_state.is_running:
+        raise HTTPException(status_code=400, detail="Database compaction is running")
     try:
         with get_db() as con:
-            # Delete from snapshot_data first due to foreign key constraints conceptually (though DuckDB handles it based on schema)
-            con.execute("DELETE FROM snapshot_data WHERE snapshot_id = ?", [snapshot_id])
-            con.execute("DELETE FROM snapshots WHERE id = ?", [snapshot_id])
+            # One transaction, so a failure part way doesn't leave versions moved off a snapshot that still exists
+            con.execute("BEGIN TRANSACTION")
+            try:
+                # Delete the rows first, while the snapshot still says which store holds them
+                remove_snapshot(con, snapshot_id)
+                con.execute("DELETE FROM scrape_checkpoints WHERE snapshot_id = ?", [snapshot_id])
+                con.execute("DELETE FROM scrape_staging WHERE snapshot_id = ?", [snapshot_id])
+                con.execute("DELETE FROM snapshot_changes WHERE snapshot_id = ?", [snapshot_id])
+                children = con.execute("SELECT id FROM snapshots WHERE parent_id = ?", [snapshot_id]).fetchall()
+                con.execute("DELETE FROM snapshots WHERE id = ?", [snapshot_id])
+                # Snapshots that were compared against it now compare against their new predecessor
+                for (child_id,) in children:
+                    record_changes(con, child_id)
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+            invalidate_snapshot(snapshot_id)
             return {"message": f"Snapshot {snapshot_id} deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/snapshots/{snapshot_id}/export")
+async def export_snapshot_file(request: Request, snapshot_id: int):
+    """Downloads a snapshot as a Parquet file that /snapshots/import can load."""
+    fd, path = tempfile.mkstemp(suffix=".parquet")
+    os.close(fd)
+
+    def export():
+        with get_db() as con:
+            export_snapshot(con, snapshot_id, path)
+
+    try:
+        await heavy_lane.run(request, export)
+    except ValueError as e:
+        os.remove(path)
+        raise HTTPException(status_code=404, detail=str(e))
+    except QueryCancelled:
+        os.remove(path)
+        raise
+    except Exception as e:
+        os.remove(path)
+        raise HTTPException(status_code=500, detail=str(e))
+    return FileResponse(path, media_type="application/vnd.apache.parquet",
+                        filename=f"snapshot-{snapshot_id}.parquet", background=BackgroundTask(os.remove, path))
+
+@app.post("/snapshots/import")
+async def import_snapshot_file(request: Request, name: str = None):
+    """
+    Loads an exported Parquet file, sent as the request body, as a new snapshot:
+    curl --data-binary @snapshot-1.parquet "http://127.0.0.1:8000/snapshots/import"
+    Only uploads are accepted, never paths on the server's disk.
+    """
+    if compaction_state.is_running:
+        raise HTTPException(status_code=400, detail="Database compaction is running")
+    fd, path = tempfile.mkstemp(suffix=".parquet")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            async for chunk in request.stream():
+                file.write(chunk)
+        if os.path.getsize(path) == 0:
+            raise HTTPException(status_code=400, detail="Send the exported Parquet file as the request body")
+
+        def load():
+            with get_db() as con:
+                return import_snapshot(con, path, name)
+
+        snapshot_id, row_count = await asyncio.get_running_loop().run_in_executor(None, load)
+    except HTTPException:
+        raise
+    except (ValueError, duckdb.InvalidInputException) as e:
+        raise HTTPException(status_code=400, detail=str(e).replace(path, "upload"))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        os.remove(path)
+    invalidate_snapshot(snapshot_id)
+    return {"snapshot_id": snapshot_id, "row_count": row_count}
+
 @app.get("/rows")
-def get_rows(
+async def get_rows(
+    request: Request,
     snapshot_id: int, 
     search: str = "", 
     search_mode: str = "contains", # prefix, exact, contains
@@ -72,65 +170,140 @@ def get_rows(
     sort_col: str = "domain", 
     sort_dir: str = "asc", 
     limit: int = 100, 
-    offset: int = 0
+    offset: int = 0,
+    cursor: str = None
 ):
-    """Fetches paginated rows from a specific snapshot with sorting and filtering."""
+    """
+    Fetches paginated rows from a specific snapshot with sorting and filtering.
+    Pass the previous page's next_cursor as `cursor` to continue after it; `offset`
+    is only used without a cursor.
+    """
     if sort_col not in ["domain", "price_usd", "length"]:
         sort_col = "domain"
     if sort_dir.lower() not in ["asc", "desc"]:
         sort_dir = "asc"
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, sort_col, sort_dir)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
+    start_time = time.time()
+    # Identical requests share one cached result; ILIKE ignores case, so the search does too
+    key = ("rows", snapshot_id, search_mode if search else "", search.lower(), min_price, max_price,
+           min_length, max_length, sort_col, sort_dir.lower(), limit, cursor or offset)
+    result, cached = await result_cache.get_or_compute(key, lambda: heavy_lane.run(
+        request, fetch_rows, snapshot_id, search, search_mode, min_price, max_price, min_length,
+        max_length, sort_col, sort_dir, limit, offset, after), [snapshot_id])
+    return {**result, "cached": cached, "queue_ms": _queue_ms(request, cached),
+            "elapsed_ms": round((time.time() - start_time) * 1000, 2)}
+
+def _queue_ms(request: Request, cached: bool) -> float:
+    """Time this request waited for a lane slot; cached and coalesced results never do."""
+    return 0.0 if cached else round(getattr(request.state, "queue_ms", 0.0), 2)
+
+def fetch_rows(snapshot_id, search, search_mode, min_price, max_price, min_length, max_length,
+               sort_col, sort_dir, limit, offset, after) -> dict:
+    """Runs the /rows queries for already validated parameters."""
     start_time = time.time()
     try:
         with get_db() as con:
             # Build query dynamically
-            base_query = "FROM snapshot_data WHERE snapshot_id = ?"
-            params = [snapshot_id]
+            source, params = snapshot_rows(con, snapshot_id)
+            prices, _ = snapshot_prices(con, snapshot_id)
+            filters = ""
+            matches = None
             
             # Text search (Case Insensitive ILIKE is very fast in DuckDB)
             if search:
                 if search_mode == "prefix":
-                    base_query += " AND domain ILIKE ?"
+                    filters += " AND domain ILIKE ?"
                     params.append(f"{search}%")
                 elif search_mode == "exact":
-                    base_query += " AND domain = ?"
+                    filters += " AND domain = ?"
                     params.append(search.lower())
                 else: # contains
-                    base_query += " AND domain ILIKE ?"
-                    params.append(f"%{search}%")
+                    # The trigram index narrows selective searches down to a few domain ids
+                    matches = contains_matches(con, search)
+                    if matches is None:
+                        filters += " AND domain ILIKE ?"
+                        params.append(f"%{search}%")
+                    elif matches:
+                        filters += f" AND domain_id IN ({','.join(map(str, matches))})"
+                    else:
+                        filters += " AND false"
             
             if min_price is not None:
-                base_query += " AND price_usd >= ?"
+                filters += " AND price_usd >= ?"
                 params.append(min_price)
             if max_price is not None:
-                base_query += " AND price_usd <= ?"
+                filters += " AND price_usd <= ?"
                 params.append(max_price)
                 
             # Length filters
             if min_length is not None:
-                base_query += " AND length >= ?"
+                filters += " AND length >= ?"
                 params.append(min_length)
             if max_length is not None:
-                base_query += " AND length <= ?"
+                filters += " AND length <= ?"
                 params.append(max_length)
                 
-            # Execute COUNT query
-            count_query = f"SELECT count(*) {base_query}"
-            total_count = con.execute(count_query, params).fetchone()[0]
+            # Names and lengths come from a join with domains. Without a filter on them (a
+            # search resolved to domain ids isn't one), the count reads the prices alone,
+            # and a price sort only joins the page it returns
+            by_name = (bool(search) and matches is None) or min_length is not None or max_length is not None
+            
+            # Execute COUNT query, unless row_count or an earlier block already answered it
+            snapshot = con.execute("SELECT row_count FROM snapshots WHERE id = ?", [snapshot_id]).fetchone()
+            row_count = snapshot[0] if snapshot else 0
+            count_key = (snapshot_id, row_count, search_mode if search else "", search.lower(),
+                         min_price, max_price, min_length, max_length)
+            if not filters:
+                total_count = row_count
+            else:
+                total_count = count_cache.get(count_key)
+            if total_count is None:
+                count_query = f"SELECT count(*) FROM {source if by_name else prices} sd WHERE 1=1{filters}"
+                total_count = con.execute(count_query, params).fetchone()[0]
+                count_cache.put(count_key, total_count)
             
-            # Execute DATA query
-            data_query = f"SELECT domain_id, domain, price_usd, length {base_query} ORDER BY {sort_col} {sort_dir} LIMIT {limit} OFFSET {offset}"
+            # Execute DATA query, after the cursor or skipping `offset` rows
+            page = f"LIMIT {limit}" if after else f"LIMIT {limit} OFFSET {offset}"
+            if after:
+                keyset, keyset_params = keyset_condition(sort_col, "domain_id", sort_dir, *after)
+                filters += keyset
+                params += keyset_params
+            if by_name or sort_col != "price_usd":
+                data_query = f"SELECT domain_id, domain, price_usd, length FROM {source} sd WHERE 1=1{filters} ORDER BY {order_by(sort_col, 'domain_id', sort_dir)} {page}"
+            else:
+                data_query = f"""
+                    SELECT p.domain_id, d.name, p.price_usd, d.length
+                    FROM (
+                        SELECT domain_id, price_usd FROM {prices} sd WHERE 1=1{filters}
+                        ORDER BY {order_by('price_usd', 'domain_id', sort_dir)} {page}
+                    ) p
+                    JOIN domains d ON d.id = p.domain_id
+                    ORDER BY {order_by('p.price_usd', 'p.domain_id', sort_dir)}
+                """
             result = con.execute(data_query, params).fetchall()
             
             rows = []
             for r in result:
                 rows.append({"domain_id": r[0], "domain": r[1], "price_usd": r[2], "length": r[3]})
+            
+            # A full page may have more rows after it
+            next_cursor = None
+            if rows and len(rows) == limit:
+                last = rows[-1]
+                next_cursor = encode_cursor(sort_col, sort_dir, last[sort_col], last["domain_id"])
                 
             elapsed_ms = (time.time() - start_time) * 1000
             
             return {
                 "rows": rows,
                 "total_count": total_count,
+                "next_cursor": next_cursor,
                 "elapsed_ms": round(elapsed_ms, 2)
             }
             
@@ -138,60 +311,110 @@ def get_rows(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/diff")
-def get_diff(
+async def get_diff(
+    request: Request,
     snapshot_a: int,
     snapshot_b: int,
     diff_type: str = "all", # all, new, deleted, changed
     limit: int = 100,
-    offset: int = 0
+    offset: int = 0,
+    cursor: str = None
 ):
     """
     Compares two snapshots and returns the differences.
     snapshot_a is the OLD snapshot, snapshot_b is the NEW snapshot.
+    Rows are ordered by domain; `cursor` continues after a previous page like in /rows.
     """
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, "domain", "asc")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    start_time = time.time()
+    key = ("diff", snapshot_a, snapshot_b, diff_type, limit, cursor or offset)
+    result, cached = await result_cache.get_or_compute(key, lambda: heavy_lane.run(
+        request, fetch_diff, snapshot_a, snapshot_b, diff_type, limit, offset, after), [snapshot_a, snapshot_b])
+    return {**result, "cached": cached, "queue_ms": _queue_ms(request, cached),
+            "elapsed_ms": round((time.time() - start_time) * 1000, 2)}
+
+def fetch_diff(snapshot_a, snapshot_b, diff_type, limit, offset, after) -> dict:
+    """Runs the /diff queries for already validated parameters."""
+    page = f"LIMIT {limit}" if after else f"LIMIT {limit} OFFSET {offset}"
     start_time = time.time()
     try:
         with get_db() as con:
-            filter_condition = ""
-            if diff_type == "new":
-                filter_condition = "AND a.domain IS NULL AND b.domain IS NOT NULL"
-            elif diff_type == "deleted":
-                filter_condition = "AND a.domain IS NOT NULL AND b.domain IS NULL"
-            elif diff_type == "changed":
-                filter_condition = "AND a.domain IS NOT NULL AND b.domain IS NOT NULL AND a.price_usd != b.price_usd"
+            # A -> B along stored change sets, or between two versioned snapshots, only
+            # reads the changes; anything else joins both snapshots
+            chain = change_chain(con, snapshot_a, snapshot_b) if snapshot_a != snapshot_b else None
+            source = None
+            if chain:
+                source, params = composed_changes(chain)
+            elif snapshot_a != snapshot_b and is_versioned(con, snapshot_a) and is_versioned(con, snapshot_b):
+                source, params = versioned_diff(snapshot_a, snapshot_b)
+            if source:
+                base_query = f"FROM {source} c WHERE 1=1"
+                if diff_type in ("new", "deleted", "changed"):
+                    base_query += " AND status = ?"
+                    params = params + [diff_type.upper()]
+                keyset, keyset_params = keyset_condition("domain", "domain_id", "asc", *after) if after else ("", [])
+                count_query = f"SELECT count(*) {base_query}"
+                data_query = f"""
+                    SELECT domain_id, domain, old_price, new_price, status
+                    {base_query}{keyset}
+                    ORDER BY {order_by("domain", "domain_id", "ASC")}
+                    {page}
+                """
             else:
-                filter_condition = "AND (a.domain IS NULL OR b.domain IS NULL OR a.price_usd != b.price_usd)"
-            
-            # Using FULL OUTER JOIN which DuckDB optimizes with Hash Joins very efficiently
-            base_query = f"""
-                FROM (SELECT domain_id, domain, price_usd FROM snapshot_data WHERE snapshot_id = {snapshot_a}) a
-                FULL OUTER JOIN (SELECT domain_id, domain, price_usd FROM snapshot_data WHERE snapshot_id = {snapshot_b}) b
-                ON a.domain_id = b.domain_id
-                WHERE 1=1 {filter_condition}
-            """
+                filter_condition = ""
+                if diff_type == "new":
+                    filter_condition = "AND a.domain_id IS NULL AND b.domain_id IS NOT NULL"
+                elif diff_type == "deleted":
+                    filter_condition = "AND a.domain_id IS NOT NULL AND b.domain_id IS NULL"
+                elif diff_type == "changed":
+                    filter_condition = "AND a.domain_id IS NOT NULL AND b.domain_id IS NOT NULL AND a.price_usd != b.price_usd"
+                else:
+                    filter_condition = "AND (a.domain_id IS NULL OR b.domain_id IS NULL OR a.price_usd != b.price_usd)"
+                
+                # Using FULL OUTER JOIN which DuckDB optimizes with Hash Joins very efficiently.
+                # The join runs on ids and prices; names are looked up for the differences only
+                rows_a, params_a = snapshot_prices(con, snapshot_a)
+                rows_b, params_b = snapshot_prices(con, snapshot_b)
+                base_query = f"""
+                    FROM {rows_a} a
+                    FULL OUTER JOIN {rows_b} b
+                    ON a.domain_id = b.domain_id
+                    WHERE 1=1 {filter_condition}
+                """
+                params = params_a + params_b
+                keyset, keyset_params = keyset_condition("d.name", "j.domain_id", "asc", *after) if after else ("", [])
+                count_query = f"SELECT count(*) {base_query}"
+                data_query = f"""
+                    SELECT j.domain_id, d.name as domain, j.old_price, j.new_price, j.status
+                    FROM (
+                        SELECT 
+                            COALESCE(a.domain_id, b.domain_id) as domain_id,
+                            a.price_usd as old_price,
+                            b.price_usd as new_price,
+                            CASE 
+                                WHEN a.domain_id IS NULL THEN 'NEW'
+                                WHEN b.domain_id IS NULL THEN 'DELETED'
+                                WHEN a.price_usd != b.price_usd THEN 'CHANGED'
+                                ELSE 'UNCHANGED'
+                            END as status
+                        {base_query}
+                    ) j
+                    JOIN domains d ON d.id = j.domain_id
+                    WHERE 1=1{keyset}
+                    ORDER BY {order_by("domain", "j.domain_id", "ASC")}
+                    {page}
+                """
             
             # Execute COUNT
-            count_query = f"SELECT count(*) {base_query}"
-            total_count = con.execute(count_query).fetchone()[0]
+            total_count = con.execute(count_query, params).fetchone()[0]
             
             # Execute DATA
-            data_query = f"""
-                SELECT 
-                    COALESCE(a.domain_id, b.domain_id) as domain_id,
-                    COALESCE(a.domain, b.domain) as domain,
-                    a.price_usd as old_price,
-                    b.price_usd as new_price,
-                    CASE 
-                        WHEN a.domain IS NULL THEN 'NEW'
-                        WHEN b.domain IS NULL THEN 'DELETED'
-                        WHEN a.price_usd != b.price_usd THEN 'CHANGED'
-                        ELSE 'UNCHANGED'
-                    END as status
-                {base_query}
-                ORDER BY domain ASC
-                LIMIT {limit} OFFSET {offset}
-            """
-            result = con.execute(data_query).fetchall()
+            result = con.execute(data_query, params + keyset_params).fetchall()
             
             rows = []
             for r in result:
@@ -202,36 +425,45 @@ def get_diff(
                     "new_price": r[3],
                     "status": r[4]
                 })
+            
+            next_cursor = None
+            if rows and len(rows) == limit:
+                next_cursor = encode_cursor("domain", "asc", rows[-1]["domain"], rows[-1]["domain_id"])
                 
             elapsed_ms = (time.time() - start_time) * 1000
             return {
                 "rows": rows,
                 "total_count": total_count,
+                "next_cursor": next_cursor,
                 "elapsed_ms": round(elapsed_ms, 2)
             }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/domain/{domain_id}/history")
-def get_domain_history(domain_id: int):
+async def get_domain_history(request: Request, domain_id: int):
     """Returns the complete timeline of a domain across all snapshots."""
+    return await light_lane.run(request, fetch_domain_history, domain_id)
+
+def fetch_domain_history(domain_id: int) -> dict:
     try:
         with get_db() as con:
             domain_name = con.execute("SELECT name FROM domains WHERE id = ?", [domain_id]).fetchone()
             if not domain_name:
                 raise HTTPException(status_code=404, detail="Domain not found")
                 
-            query = """
+            prices, params = domain_prices(domain_id)
+            query = f"""
                 SELECT 
                     s.id as snapshot_id,
                     s.name as snapshot_name,
                     s.created_at,
                     sd.price_usd
                 FROM snapshots s
-                LEFT JOIN snapshot_data sd ON s.id = sd.snapshot_id AND sd.domain_id = ?
+                LEFT JOIN {prices} sd ON s.id = sd.snapshot_id
                 ORDER BY s.id ASC
             """
-            result = con.execute(query, [domain_id]).fetchall()
+            result = con.execute(query, params).fetchall()
             
             history = []
             for r in result:
@@ -270,6 +502,8 @@ def get_domain_history(domain_id: int):
 @app.post("/scrape/start")
 async def start_scraper(snapshot_name: str):
     """Starts the HugeDomains scraper in the background."""
+    if compaction_state.is_running:
+        raise HTTPException(status_code=400, detail="Database compaction is running")
     if scraper_state.is_running:
         raise HTTPException(status_code=400, detail="Scraper is already running")
     
@@ -277,6 +511,33 @@ async def start_scraper(snapshot_name: str):
     asyncio.create_task(run_scraper_engine(snapshot_name))
     return {"message": f"Scraping started for '{snapshot_name}'"}
 
+@app.post("/scrape/resume/{snapshot_id}")
+async def resume_scraper(request: Request, snapshot_id: int):
+    """Resumes an interrupted or stopped scrape from its stream checkpoints."""
+    if compaction_state.is_running:
+        raise HTTPException(status_code=400, detail="Database compaction is running")
+    if scraper_state.is_running:
+        raise HTTPException(status_code=400, detail="Scraper is already running")
+    status, has_checkpoints = await light_lane.run(request, resume_info, snapshot_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    if status != "in_progress":
+        raise HTTPException(status_code=400, detail=f"Snapshot {snapshot_id} is {status}, only an in-progress scrape can be resumed")
+    if not has_checkpoints:
+        raise HTTPException(status_code=400, detail=f"Snapshot {snapshot_id} has no checkpoints to resume from")
+    
+    asyncio.create_task(run_scraper_engine("", resume_snapshot_id=snapshot_id))
+    return {"message": f"Resuming scrape for snapshot {snapshot_id}"}
+
+def resume_info(snapshot_id: int):
+    """(status, has checkpoints) of a snapshot, or (None, False) when it doesn't exist."""
+    with get_db() as con:
+        row = con.execute("""
+            SELECT status, EXISTS (SELECT 1 FROM scrape_checkpoints WHERE snapshot_id = s.id)
+            FROM snapshots s WHERE id = ?
+        """, [snapshot_id]).fetchone()
+    return (row[0], row[1]) if row else (None, False)
+
 @app.get("/scrape/status")
 def get_scraper_status():
     """Returns the live status of the running extraction."""
@@ -284,7 +545,13 @@ def get_scraper_status():
         "is_running": scraper_state.is_running,
         "status": scraper_state.status,
         "snapshot_name": scraper_state.snapshot_name,
-        "total_extracted": scraper_state.total_extracted
+        "total_extracted": scraper_state.total_extracted,
+        "sessions": scraper_state.session_pool.stats() if scraper_state.session_pool else None,
+        "concurrency": scraper_state.limiter.stats() if scraper_state.limiter else None,
+        "retries": scraper_state.retry_budget.stats() if scraper_state.retry_budget else None,
+        "failed_streams": scraper_state.failed_streams,
+        "rows": duplicate_stats(list(scraper_state.frontiers.values())),
+        "dedup": scraper_state.seen.stats() if scraper_state.seen is not None else None
     }
 
 @app.post("/scrape/stop")
@@ -295,6 +562,40 @@ def stop_scraper():
     stop_scraper_engine()
     return {"message": "Stop signal sent to scraper"}
 
+@app.post("/admin/compact")
+async def start_compaction():
+    """Rewrites the database into a fresh file to reclaim space left by deleted snapshots."""
+    if compaction_state.is_running:
+        raise HTTPException(status_code=400, detail="Compaction is already running")
+    if scraper_state.is_running:
+        raise HTTPException(status_code=400, detail="Stop the scraper before compacting")
+    # Set here rather than in the worker thread, so writers are refused from now on
+    compaction_state.is_running = True
+
+    async def run():
+        try:
+            await asyncio.to_thread(compact_database)
+        except Exception:
+            pass  # Recorded on compaction_state
+
+    asyncio.create_task(run())
+    return {"message": "Compaction started"}
+
+@app.get("/admin/compact")
+def get_compaction_status():
+    """Returns the progress of the running or last compaction."""
+    return compaction_state.stats()
+
+@app.get("/admin/cache")
+def get_cache_stats():
+    """Returns the entries and hit rates of the /rows and /diff caches."""
+    return {"results": result_cache.stats(), "counts": count_cache.stats()}
+
+@app.get("/admin/lanes")
+def get_lane_stats():
+    """Returns the load, queue waits, timeouts and disconnects of each query lane."""
+    return {"light": light_lane.stats(), "heavy": heavy_lane.stats()}
+
 # === STATIC FILES FOR FRONTEND ===
 def get_resource_path(relative_path):
     try:
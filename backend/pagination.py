@@ -0,0 +1,41 @@
+import base64
+import binascii
+import json
+from decimal import Decimal
+
+# Keyset pagination: a page ends at some (sort value, domain_id) and the next one starts
+# right after it, so deep pages cost the same as the first instead of sorting and
+# skipping every row before them. Rows are ordered NULLS LAST in both directions, and
+# domain_id breaks ties between equal sort values.
+
+def order_by(column: str, id_column: str, sort_dir: str) -> str:
+    return f"{column} {sort_dir} NULLS LAST, {id_column} {sort_dir}"
+
+def encode_cursor(sort_col: str, sort_dir: str, value, domain_id: int) -> str:
+    """Opaque cursor pointing just past a row with this sort value and domain id."""
+    if isinstance(value, Decimal):
+        value = str(value)
+    raw = json.dumps([sort_col, sort_dir.lower(), value, domain_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort_col: str, sort_dir: str) -> tuple:
+    """(value, domain_id) of a cursor. Raises ValueError if it is malformed or from another sort order."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_col, cursor_dir, value, domain_id = json.loads(raw)
+        domain_id = int(domain_id)
+        if sort_col == "price_usd" and value is not None:
+            value = Decimal(value)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, ArithmeticError):
+        raise ValueError("Invalid cursor")
+    if (cursor_col, cursor_dir) != (sort_col, sort_dir.lower()):
+        raise ValueError("Cursor belongs to a different sort order")
+    return value, domain_id
+
+def keyset_condition(column: str, id_column: str, sort_dir: str, value, domain_id: int) -> tuple[str, list]:
+    """SQL condition (starting with AND) selecting the rows after a cursor, with its parameters."""
+    op = ">" if sort_dir.lower() == "asc" else "<"
+    if value is None:
+        # Past the last non-NULL value only NULLs remain, ordered by id
+        return f" AND {column} IS NULL AND {id_column} {op} ?", [domain_id]
+    return f" AND ({column} IS NULL OR ({column}, {id_column}) {op} (?, ?))", [value, domain_id]
@@ -0,0 +1,115 @@
+import asyncio
+import math
+from typing import Optional
+
+# Lengths the search form accepts
+ALL_LENGTHS = range(1, 64)
+# A partition with more results than this gets split into price bands
+SPLIT_THRESHOLD = 5000
+# Bisection depth per length (at most 2**depth bands)
+MAX_SPLIT_DEPTH = 6
+# Upper price assumed when bisecting the open-ended top band
+PRICE_CEILING = 10_000_000
+
+def _format_price(price: Optional[float]) -> str:
+    return "" if price is None else f"{price:g}"
+
+def band_key(price_from: Optional[float], price_to: Optional[float]) -> str:
+    """Stable text key for a price band, "" for a whole length (e.g. "2495:" or ":95")."""
+    if price_from is None and price_to is None:
+        return ""
+    return f"{_format_price(price_from)}:{_format_price(price_to)}"
+
+def parse_band(key: str) -> tuple[Optional[float], Optional[float]]:
+    if not key:
+        return None, None
+    low, high = key.split(":")
+    return (float(low) if low else None), (float(high) if high else None)
+
+def band_params(band: str) -> dict:
+    """Search parameters restricting a request to the band."""
+    price_from, price_to = parse_band(band)
+    params = {}
+    if price_from is not None:
+        params["price_from"] = _format_price(price_from)
+    if price_to is not None:
+        params["price_to"] = _format_price(price_to)
+    return params
+
+def is_soft_block(rows_on_page: int, page_count: Optional[int]) -> bool:
+    """
+    True for a 200 page with no rows and no "Page X of N" banner. Even an empty result
+    set shows the banner, so such a page is a block, and both probes and streams retry it.
+    """
+    return rows_on_page == 0 and page_count is None
+
+def estimate_count(page_count: Optional[int], rows_on_page: int, probe_rows: int) -> Optional[int]:
+    """
+    Result count implied by a probe page of `probe_rows` rows and its "Page 1 of N"
+    banner, or None without the banner.
+    """
+    if page_count is None:
+        return None
+    if rows_on_page == 0:
+        return 0
+    if page_count <= 1:
+        return rows_on_page
+    return page_count * probe_rows
+
+def split_band(price_from: Optional[float], price_to: Optional[float]):
+    """
+    Splits a band at its geometric midpoint, since prices are spread over several
+    orders of magnitude. Both halves include the midpoint so no domain can fall
+    between them; the duplicates at the edge are removed by the dedup set.
+    """
+    low = max(price_from or 0, 1)
+    high = min(price_to if price_to is not None else PRICE_CEILING, PRICE_CEILING)
+    if high - low < 2:
+        return None
+    mid = float(round(math.sqrt(low * high)))
+    if mid <= low or mid >= high:
+        return None
+    return (price_from, mid), (mid, price_to)
+
+async def plan_length(probe, length: int, split_threshold: int = SPLIT_THRESHOLD,
+                      max_depth: int = MAX_SPLIT_DEPTH):
+    """
+    Returns [(band, estimated_count)] covering one length. probe(length, price_from,
+    price_to) returns a result count, or None if it could not be determined, in which
+    case the band is kept whole.
+    """
+    async def visit(price_from, price_to, depth):
+        count = await probe(length, price_from, price_to)
+        if count == 0:
+            return []
+        if count is not None and count > split_threshold and depth < max_depth:
+            halves = split_band(price_from, price_to)
+            if halves:
+                parts = await asyncio.gather(*(visit(lo, hi, depth + 1) for lo, hi in halves))
+                return [band for part in parts for band in part]
+        return [(band_key(price_from, price_to), count)]
+
+    return await visit(None, None, 0)
+
+async def plan_partitions(probe, lengths=ALL_LENGTHS, split_threshold: int = SPLIT_THRESHOLD,
+                          max_depth: int = MAX_SPLIT_DEPTH):
+    """Probes every length concurrently and returns [(length, band, estimated_count)]."""
+    plans = await asyncio.gather(*(plan_length(probe, length, split_threshold, max_depth) for length in lengths))
+    return [(length, band, count) for length, plan in zip(lengths, plans) for band, count in plan]
+
+def stream_channels(count: Optional[int], channels, page_size: int, split_threshold: int = SPLIT_THRESHOLD):
+    """
+    Sort channels worth running for a partition of about `count` results. A single page
+    is read by one channel. The name pair walks the same domains as the price pair in
+    an unrelated order, so it roughly doubles the rows fetched and is only added for
+    partitions that stayed above the split threshold; price bands are the cheaper way
+    to get parallelism. Streams run until they cross or end either way, so an estimate
+    that is off only costs parallelism.
+    """
+    if count is None:
+        return list(channels)
+    if count <= page_size:
+        return list(channels[:1])
+    if count <= split_threshold:
+        return list(channels[:2])
+    return list(channels)
@@ -0,0 +1,78 @@
+import asyncio
+import random
+import time
+from typing import Optional
+
+# Base backoff per failure kind in seconds; blocks need longer to cool down than errors
+BACKOFF_BASE = {"blocked": 2.0, "error": 1.0, "status": 1.0}
+BACKOFF_CAP = 30.0
+
+def backoff_delay(attempt: int, outcome: str) -> float:
+    """Exponential backoff with full jitter, so failed streams don't retry in lockstep."""
+    base = BACKOFF_BASE.get(outcome, 1.0)
+    return random.uniform(0, min(BACKOFF_CAP, base * (2 ** attempt)))
+
+class TokenBucket:
+    """Global request pacing shared by every stream of a scan."""
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens: float = burst
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class RetryBudget:
+    """
+    Caps retries for a whole scan at `floor` plus `ratio` retries per successful
+    request, and keeps the per-scan retry report.
+    """
+    def __init__(self, ratio: float = 0.2, floor: int = 200):
+        self.ratio = ratio
+        self.floor = floor
+        self.successes: int = 0
+        self.retries: int = 0
+        self.wasted_requests: int = 0
+        self.exhausted: int = 0
+        self._recoveries: int = 0
+        self._recovery_total: float = 0.0
+        self._recovery_max: float = 0.0
+
+    def record_failure(self):
+        self.wasted_requests += 1
+
+    def record_success(self, first_failure_at: Optional[float] = None):
+        self.successes += 1
+        if first_failure_at is not None:
+            waited = time.monotonic() - first_failure_at
+            self._recoveries += 1
+            self._recovery_total += waited
+            self._recovery_max = max(self._recovery_max, waited)
+
+    def allow_retry(self) -> bool:
+        if self.retries >= self.floor + self.ratio * self.successes:
+            self.exhausted += 1
+            return False
+        self.retries += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "successes": self.successes,
+            "retries": self.retries,
+            "wasted_requests": self.wasted_requests,
+            "budget_remaining": max(int(self.floor + self.ratio * self.successes) - self.retries, 0),
+            "budget_exhausted": self.exhausted,
+            "avg_retry_to_success_s": round(self._recovery_total / self._recoveries, 2) if self._recoveries else 0.0,
+            "max_retry_to_success_s": round(self._recovery_max, 2),
+        }
@@ -0,0 +1,143 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+from curl_cffi.requests import AsyncSession
+
+# Responses that mean the current proxy exit IP is burned
+ROTATE_ON_STATUS = (403, 429)
+
+class PooledSession:
+    """One warm curl_cffi session (and its keep-alive connections) owned by the pool."""
+    def __init__(self, slot_id: int):
+        self.slot_id = slot_id
+        self.session: Optional[AsyncSession] = None
+        self.requests: int = 0
+        self.opened_at: float = 0.0
+
+class SessionPool:
+    """
+    Keeps a fixed number of long-lived sessions instead of paying the TLS handshake on
+    every page. The proxy gateway hands out a new exit IP per connection, so rotating
+    identity only means closing one slot's session; the other slots stay warm.
+
+    A slot is rotated after `rotate_every` requests, after `max_age` seconds, on a
+    403/429, or after a transport error.
+    """
+    def __init__(self, size: int, proxies: dict, headers: dict, impersonate: str = "chrome120",
+                 timeout: int = 45, rotate_every: int = 25, max_age: float = 120.0):
+        self.size = size
+        self.proxies = proxies
+        self.headers = headers
+        self.impersonate = impersonate
+        self.timeout = timeout
+        self.rotate_every = rotate_every
+        self.max_age = max_age
+
+        # LIFO so that under low load the same few sessions stay hot
+        self._idle: asyncio.LifoQueue = asyncio.LifoQueue()
+        for slot_id in range(size):
+            self._idle.put_nowait(PooledSession(slot_id))
+
+        self.total_requests: int = 0
+        self.sessions_opened: int = 0
+        self.rotations = {"requests": 0, "age": 0, "blocked": 0, "error": 0}
+
+    async def _open(self, slot: PooledSession):
+        slot.session = AsyncSession(impersonate=self.impersonate, proxies=self.proxies,
+                                    headers=self.headers, timeout=self.timeout)
+        slot.requests = 0
+        slot.opened_at = time.monotonic()
+        self.sessions_opened += 1
+
+    async def _discard(self, slot: PooledSession):
+        if slot.session is not None:
+            try:
+                await slot.session.close()
+            except Exception:
+                pass
+        slot.session = None
+
+    async def rotate(self, slot: PooledSession, reason: str):
+        """Drops the slot's session so its next request goes out through a new exit IP."""
+        self.rotations[reason] = self.rotations.get(reason, 0) + 1
+        await self._discard(slot)
+
+    async def acquire(self) -> PooledSession:
+        slot = await self._idle.get()
+        if slot.session is not None:
+            if slot.requests >= self.rotate_every:
+                await self.rotate(slot, "requests")
+            elif time.monotonic() - slot.opened_at >= self.max_age:
+                await self.rotate(slot, "age")
+        if slot.session is None:
+            await self._open(slot)
+        return slot
+
+    def release(self, slot: PooledSession):
+        self._idle.put_nowait(slot)
+
+    async def get(self, url: str, **kwargs):
+        """Performs a GET on a pooled session, rotating the slot if the proxy got blocked."""
+        slot = await self.acquire()
+        try:
+            try:
+                response = await slot.session.get(url, **kwargs)
+            except Exception:
+                await self.rotate(slot, "error")
+                raise
+            slot.requests += 1
+            self.total_requests += 1
+            if response.status_code in ROTATE_ON_STATUS:
+                await self.rotate(slot, "blocked")
+            return response
+        finally:
+            self.release(slot)
+
+    @asynccontextmanager
+    async def stream(self, url: str, **kwargs):
+        """
+        Like get(), but yields the response before its body has been read. Whatever the
+        caller leaves unread is drained before the slot goes back to the pool, so its
+        connection is reused at the end of a response, not halfway through one.
+        """
+        slot = await self.acquire()
+        try:
+            blocked = False
+            try:
+                async with slot.session.stream("GET", url, **kwargs) as response:
+                    slot.requests += 1
+                    self.total_requests += 1
+                    blocked = response.status_code in ROTATE_ON_STATUS
+                    yield response
+                    await self._drain(response)
+            except Exception:
+                await self.rotate(slot, "error")
+                raise
+            if blocked:
+                await self.rotate(slot, "blocked")
+        finally:
+            self.release(slot)
+
+    async def _drain(self, response):
+        """Reads the rest of a streamed body, raising if its transfer failed."""
+        # A body read to its end has nothing queued and no transfer running, and
+        # aiter_content() would wait forever for another end of stream
+        if response.astream_task.done() and response.queue.empty():
+            return
+        async for _ in response.aiter_content():
+            pass
+
+    def stats(self) -> dict:
+        reused = max(self.total_requests - self.sessions_opened, 0)
+        return {
+            "size": self.size,
+            "requests": self.total_requests,
+            "sessions_opened": self.sessions_opened,
+            "reuse_ratio": round(reused / self.total_requests, 3) if self.total_requests else 0.0,
+            "rotations": dict(self.rotations),
+        }
+
+    async def close(self):
+        while not self._idle.empty():
+            await self._discard(self._idle.get_nowait())
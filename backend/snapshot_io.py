@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import time
+from typing import Optional
+
+from database import get_db, init_db
+from changes import record_changes
+from storage import snapshot_rows, store_completed
+from trigram import domain_watermark, index_domains
+
+# Parquet key/value metadata entry holding the snapshot header
+METADATA_KEY = "hugedomains.snapshot"
+FORMAT_VERSION = 1
+
+def _sql_path(path: str) -> str:
+    # COPY and read_parquet take the file name as a literal, not a parameter
+    return "'" + path.replace("'", "''") + "'"
+
+def export_snapshot(con, snapshot_id: int, path: str) -> dict:
+    """
+    Writes a snapshot to a ZSTD-compressed Parquet file with its name, created_at and
+    row_count stored in the file's key/value metadata. Domain ids are local to a
+    database, so only (domain, price_usd, length) are exported. Returns the header.
+    """
+    snapshot = con.execute("SELECT name, created_at, row_count FROM snapshots WHERE id = ?", [snapshot_id]).fetchone()
+    if snapshot is None:
+        raise ValueError(f"Snapshot {snapshot_id} not found")
+
+    source, params = snapshot_rows(con, snapshot_id)
+    row_count = con.execute(f"SELECT count(*) FROM {source}", params).fetchone()[0]
+    header = {
+        "format_version": FORMAT_VERSION,
+        "name": snapshot[0],
+        "created_at": snapshot[1].isoformat() if snapshot[1] else None,
+        "row_count": row_count,
+    }
+    # Sorted by domain so row groups compress well and can be skipped on lookups
+    con.execute(f"""
+        COPY (
+            SELECT domain, price_usd, length
+            FROM {source} r
+            ORDER BY domain
+        ) TO {_sql_path(path)} (FORMAT PARQUET, COMPRESSION ZSTD, KV_METADATA {{'{METADATA_KEY}': ?}})
+    """, params + [json.dumps(header)])
+    return header
+
+def read_metadata(con, path: str) -> dict:
+    """Snapshot header of an exported file, or {} for a Parquet file without one."""
+    rows = con.execute(f"SELECT key, value FROM parquet_kv_metadata({_sql_path(path)})").fetchall()
+    for key, value in rows:
+        if key.decode() == METADATA_KEY:
+            return json.loads(value.decode())
+    return {}
+
+def import_snapshot(con, path: str, name: Optional[str] = None) -> tuple[int, int]:
+    """
+    Loads an exported Parquet file as a new snapshot, keeping its name (unless `name`
+    is given) and created_at. Returns (snapshot_id, row_count).
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Could not find snapshot file at {path}")
+
+    header = read_metadata(con, path)
+    if header.get("format_version", FORMAT_VERSION) > FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version {header['format_version']}")
+    # The footer knows the row count, so a truncated or mismatched file is rejected before any write
+    file_rows = con.execute(f"SELECT sum(num_rows) FROM parquet_file_metadata({_sql_path(path)})").fetchone()[0] or 0
+    if "row_count" in header and file_rows != header["row_count"]:
+        raise ValueError(f"File holds {file_rows} rows but its header says {header['row_count']}")
+
+    snapshot_name = name or header.get("name") or os.path.splitext(os.path.basename(path))[0]
+    source = f"read_parquet({_sql_path(path)})"
+
+    # One transaction: the snapshot only becomes visible, and the versions it closes only
+    # change, once it has fully loaded
+    con.execute("BEGIN TRANSACTION")
+    try:
+        if header.get("created_at"):
+            con.execute("INSERT INTO snapshots (name, created_at) VALUES (?, ?)", [snapshot_name, header["created_at"]])
+        else:
+            con.execute("INSERT INTO snapshots (name) VALUES (?)", [snapshot_name])
+        snapshot_id = con.execute("SELECT currval('snapshot_seq')").fetchone()[0]
+        watermark = domain_watermark(con)
+        con.execute(f"""
+            INSERT INTO domains (name, length)
+            SELECT DISTINCT domain, length
+            FROM {source}
+            WHERE domain IS NOT NULL
+            ON CONFLICT (name) DO NOTHING
+        """)
+        index_domains(con, watermark)
+        con.execute(f"""
+            INSERT INTO snapshot_data (snapshot_id, domain_id, price_usd)
+            SELECT ?, d.id, p.price_usd
+            FROM {source} p
+            JOIN domains d ON d.name = p.domain
+            ORDER BY d.id
+        """, [snapshot_id])
+        row_count = con.execute("SELECT count(*) FROM snapshot_data WHERE snapshot_id = ?", [snapshot_id]).fetchone()[0]
+        con.execute("UPDATE snapshots SET row_count = ? WHERE id = ?", [row_count, snapshot_id])
+        record_changes(con, snapshot_id)
+        store_completed(con, snapshot_id)
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    return snapshot_id, row_count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshot Parquet export / import")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Write a snapshot to a Parquet file")
+    export_parser.add_argument("snapshot_id", type=int)
+    export_parser.add_argument("path", help="Destination .parquet file")
+
+    import_parser = commands.add_parser("import", help="Load a Parquet file as a new snapshot")
+    import_parser.add_argument("path", help="Exported .parquet file")
+    import_parser.add_argument("--name", help="Snapshot name (defaults to the name stored in the file)")
+
+    args = parser.parse_args()
+    init_db()
+    start_time = time.time()
+    with get_db() as con:
+        if args.command == "export":
+            header = export_snapshot(con, args.snapshot_id, args.path)
+            size_mb = os.path.getsize(args.path) / 1024 / 1024
+            print(f"SUCCESS: Exported {header['row_count']} rows of '{header['name']}' to {args.path} "
+                  f"({size_mb:.2f} MB) in {time.time() - start_time:.2f} seconds!")
+        else:
+            snapshot_id, row_count = import_snapshot(con, args.path, args.name)
+            print(f"SUCCESS: Imported {row_count} rows as snapshot {snapshot_id} in {time.time() - start_time:.2f} seconds!")
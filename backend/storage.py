@@ -0,0 +1,166 @@
+import os
+from typing import Optional
+
+# "full" keeps a complete copy of every snapshot in snapshot_data. "versioned" moves a
+# completed snapshot into domain_versions, which holds one row per (domain_id, price)
+# with the snapshot ids it is valid for: valid_from <= id < valid_to (NULL = still valid).
+STORAGE_ENGINE = os.getenv("STORAGE_ENGINE", "full")
+
+def is_versioned(con, snapshot_id: int) -> bool:
+    row = con.execute("SELECT storage FROM snapshots WHERE id = ?", [snapshot_id]).fetchone()
+    return row is not None and row[0] == "versioned"
+
+def latest_versioned(con) -> Optional[int]:
+    return con.execute("SELECT max(id) FROM snapshots WHERE storage = 'versioned'").fetchone()[0]
+
+def snapshot_prices(con, snapshot_id: int) -> tuple[str, list]:
+    """SQL relation of a snapshot's (domain_id, price_usd) rows, with its parameters."""
+    if is_versioned(con, snapshot_id):
+        return ("""(
+            SELECT domain_id, price_usd
+            FROM domain_versions
+            WHERE valid_from <= ? AND (valid_to IS NULL OR valid_to > ?)
+        )""", [snapshot_id, snapshot_id])
+    return "(SELECT domain_id, price_usd FROM snapshot_data WHERE snapshot_id = ?)", [snapshot_id]
+
+def snapshot_rows(con, snapshot_id: int) -> tuple[str, list]:
+    """
+    SQL relation of a snapshot's (domain_id, domain, price_usd, length) rows, with its
+    parameters. Both stores only keep domain ids; names and lengths come from domains.
+    """
+    prices, params = snapshot_prices(con, snapshot_id)
+    return (f"""(
+        SELECT p.domain_id, d.name AS domain, p.price_usd, d.length
+        FROM {prices} p
+        JOIN domains d ON d.id = p.domain_id
+    )""", params)
+
+def domain_prices(domain_id: int) -> tuple[str, list]:
+    """SQL relation of (snapshot_id, price_usd) for one domain across both stores."""
+    return ("""(
+        SELECT snapshot_id, price_usd FROM snapshot_data WHERE domain_id = ?
+        UNION ALL
+        SELECT s.id, v.price_usd
+        FROM domain_versions v
+        JOIN snapshots s ON s.storage = 'versioned' AND s.id >= v.valid_from AND (v.valid_to IS NULL OR s.id < v.valid_to)
+        WHERE v.domain_id = ?
+    )""", [domain_id, domain_id])
+
+def versioned_diff(snapshot_a: int, snapshot_b: int) -> tuple[str, list]:
+    """
+    SQL relation of (domain_id, domain, old_price, new_price, status) between two
+    versioned snapshots. Only domains with a version starting or ending between them
+    are looked at, so the cost follows the number of changes, not the catalog size.
+    """
+    low, high = min(snapshot_a, snapshot_b), max(snapshot_a, snapshot_b)
+    return ("""(
+        WITH touched AS (
+            SELECT DISTINCT domain_id FROM domain_versions
+            WHERE (valid_from > ? AND valid_from <= ?) OR (valid_to > ? AND valid_to <= ?)
+        ),
+        a AS (
+            SELECT domain_id, price_usd FROM domain_versions
+            WHERE domain_id IN (SELECT domain_id FROM touched) AND valid_from <= ? AND (valid_to IS NULL OR valid_to > ?)
+        ),
+        b AS (
+            SELECT domain_id, price_usd FROM domain_versions
+            WHERE domain_id IN (SELECT domain_id FROM touched) AND valid_from <= ? AND (valid_to IS NULL OR valid_to > ?)
+        )
+        SELECT
+            COALESCE(a.domain_id, b.domain_id) AS domain_id,
+            d.name AS domain,
+            a.price_usd AS old_price,
+            b.price_usd AS new_price,
+            CASE
+                WHEN a.domain_id IS NULL THEN 'NEW'
+                WHEN b.domain_id IS NULL THEN 'DELETED'
+                ELSE 'CHANGED'
+            END AS status
+        FROM a
+        FULL OUTER JOIN b ON a.domain_id = b.domain_id
+        JOIN domains d ON d.id = COALESCE(a.domain_id, b.domain_id)
+        WHERE a.domain_id IS NULL OR b.domain_id IS NULL OR a.price_usd != b.price_usd
+    )""", [low, high, low, high, snapshot_a, snapshot_a, snapshot_b, snapshot_b])
+
+def seal_snapshot(con, snapshot_id: int) -> bool:
+    """
+    Moves a completed snapshot from snapshot_data into domain_versions: versions whose
+    domain is gone or repriced are closed at this snapshot, and new or repriced domains
+    get a version starting here. Only a snapshot newer than every versioned one can be
+    appended; an older one keeps its full copy. Returns True if it was moved.
+    Run it inside the transaction that completes the snapshot, so a failure after it
+    rolls the closed versions back too.
+    """
+    if is_versioned(con, snapshot_id):
+        return True
+    latest = latest_versioned(con)
+    if latest is not None and snapshot_id < latest:
+        return False
+
+    con.execute("""
+        UPDATE domain_versions SET valid_to = ?
+        WHERE valid_to IS NULL AND NOT EXISTS (
+            SELECT 1 FROM snapshot_data sd
+            WHERE sd.snapshot_id = ? AND sd.domain_id = domain_versions.domain_id
+              AND sd.price_usd IS NOT DISTINCT FROM domain_versions.price_usd
+        )
+    """, [snapshot_id, snapshot_id])
+    con.execute("""
+        INSERT INTO domain_versions (domain_id, price_usd, valid_from, valid_to)
+        SELECT sd.domain_id, sd.price_usd, ?, NULL
+        FROM snapshot_data sd
+        WHERE sd.snapshot_id = ? AND NOT EXISTS (
+            SELECT 1 FROM domain_versions v WHERE v.valid_to IS NULL AND v.domain_id = sd.domain_id
+        )
+    """, [snapshot_id, snapshot_id])
+    con.execute("DELETE FROM snapshot_data WHERE snapshot_id = ?", [snapshot_id])
+    con.execute("UPDATE snapshots SET storage = 'versioned' WHERE id = ?", [snapshot_id])
+    return True
+
+def store_completed(con, snapshot_id: int) -> bool:
+    """Hands a completed snapshot to the configured storage engine."""
+    if STORAGE_ENGINE == "versioned":
+        return seal_snapshot(con, snapshot_id)
+    return False
+
+def remove_snapshot(con, snapshot_id: int):
+    """
+    Deletes a snapshot's rows from whichever store holds them. Versions that started or
+    ended at a versioned snapshot move on to the next versioned one, or are dropped if
+    they were only valid for it; if it was the latest, the versions it closed are reopened.
+    """
+    if is_versioned(con, snapshot_id):
+        next_id = con.execute(
+            "SELECT min(id) FROM snapshots WHERE storage = 'versioned' AND id > ?", [snapshot_id]
+        ).fetchone()[0]
+        if next_id is None:
+            con.execute("DELETE FROM domain_versions WHERE valid_from = ?", [snapshot_id])
+            con.execute("UPDATE domain_versions SET valid_to = NULL WHERE valid_to = ?", [snapshot_id])
+        else:
+            con.execute("DELETE FROM domain_versions WHERE valid_from = ? AND valid_to <= ?", [snapshot_id, next_id])
+            con.execute("UPDATE domain_versions SET valid_from = ? WHERE valid_from = ?", [next_id, snapshot_id])
+            con.execute("UPDATE domain_versions SET valid_to = ? WHERE valid_to = ?", [next_id, snapshot_id])
+    con.execute("DELETE FROM snapshot_data WHERE snapshot_id = ?", [snapshot_id])
+
+if __name__ == "__main__":
+    # Moves existing completed snapshots into domain_versions, oldest first
+    import time
+    from database import get_db, init_db
+
+    init_db()
+    with get_db() as con:
+        snapshot_ids = [r[0] for r in con.execute(
+            "SELECT id FROM snapshots WHERE status = 'completed' AND storage = 'full' ORDER BY id").fetchall()]
+        for snapshot_id in snapshot_ids:
+            start_time = time.time()
+            con.execute("BEGIN TRANSACTION")
+            try:
+                moved = seal_snapshot(con, snapshot_id)
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+            print(f"Snapshot {snapshot_id}: {'versioned' if moved else 'kept full (older than a versioned snapshot)'} "
+                  f"({time.time() - start_time:.2f}s)")
+        versions = con.execute("SELECT count(*) FROM domain_versions").fetchone()[0]
+        print(f"domain_versions now holds {versions} rows")
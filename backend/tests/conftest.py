@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+
+import duckdb
+import pytest
+
+# Backend modules import each other flat, and database.py reads DB_PATH on import
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="hugedomains-tests-"), "test.duckdb"))
+
+from database import create_schema
+from changes import record_changes
+from trigram import domain_watermark, index_domains
+
+def add_snapshot(con, prices: dict, name: str = "snapshot") -> int:
+    """Loads {domain: price} as a completed full snapshot the way the importers do. Returns its id."""
+    con.execute("INSERT INTO snapshots (name) VALUES (?)", [name])
+    snapshot_id = con.execute("SELECT currval('snapshot_seq')").fetchone()[0]
+    watermark = domain_watermark(con)
+    rows = [(domain, len(domain.split(".", 1)[0]), price) for domain, price in prices.items()]
+    if rows:
+        con.executemany("INSERT INTO domains (name, length) VALUES (?, ?) ON CONFLICT (name) DO NOTHING",
+                        [row[:2] for row in rows])
+        index_domains(con, watermark)
+        con.executemany("""
+            INSERT INTO snapshot_data (snapshot_id, domain_id, price_usd)
+            SELECT ?, id, ? FROM domains WHERE name = ?
+        """, [(snapshot_id, price, domain) for domain, _, price in rows])
+    con.execute("UPDATE snapshots SET row_count = ? WHERE id = ?", [len(rows), snapshot_id])
+    record_changes(con, snapshot_id)
+    return snapshot_id
+
+@pytest.fixture
+def con():
+    """Empty in-memory database with the app's schema."""
+    con = duckdb.connect(":memory:")
+    create_schema(con)
+    yield con
+    con.close()
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from cache import LRUCache, ResultCache, count_cache
+from conftest import add_snapshot
+from database import get_db, init_db
+from main import fetch_rows
+
+def test_lru_forgets_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    cache.discard(lambda key: key == "a")
+    assert cache.get("a") is None
+
+def test_lru_of_size_zero_stores_nothing():
+    cache = LRUCache(0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+@pytest.fixture
+def snapshot():
+    init_db()
+    with get_db() as con:
+        return add_snapshot(con, {"count-a.com": 10, "count-b.com": 20, "count-c.net": None}, "counts")
+
+def count(snapshot_id, search="count", min_price=None):
+    return fetch_rows(snapshot_id, search, "prefix", min_price, None, None, None, "domain", "asc", 10, 0, None)["total_count"]
+
+def test_filtered_count_is_cached(snapshot):
+    assert count(snapshot) == 3
+    hits = count_cache.hits
+    assert count(snapshot) == 3
+    assert count_cache.hits == hits + 1
+    assert count(snapshot, min_price=15) == 1
+
+def test_count_cache_misses_once_row_count_changes(snapshot):
+    assert count(snapshot) == 3
+    # A write that updates row_count but never calls invalidate_snapshot
+    with get_db() as con:
+        con.execute("INSERT INTO domains (name, length) VALUES ('count-d.com', 7)")
+        con.execute("""
+            INSERT INTO snapshot_data (snapshot_id, domain_id, price_usd)
+            SELECT ?, id, 30 FROM domains WHERE name = 'count-d.com'
+        """, [snapshot])
+        con.execute("UPDATE snapshots SET row_count = row_count + 1 WHERE id = ?", [snapshot])
+    assert count(snapshot) == 4
+
+def test_identical_requests_share_one_computation():
+    cache = ResultCache(1 << 20)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"rows": [1, 2, 3]}
+
+    async def run():
+        results = await asyncio.gather(*(cache.get_or_compute("key", compute, [1]) for _ in range(5)))
+        again = await cache.get_or_compute("key", compute, [1])
+        return results, again
+
+    results, again = asyncio.run(run())
+    assert len(calls) == 1
+    assert [cached for _, cached in results].count(False) == 1
+    assert all(value == {"rows": [1, 2, 3]} for value, _ in results)
+    assert again == ({"rows": [1, 2, 3]}, True)
+    assert cache.stats()["coalesced"] == 4
+
+def test_failed_computation_reaches_every_waiter_and_is_not_cached():
+    cache = ResultCache(1 << 20)
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("query failed")
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute("key", fail) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(run()))
+    assert cache.stats()["entries"] == 0
+
+def test_invalidation_drops_tagged_entries_and_results_in_flight():
+    cache = ResultCache(1 << 20)
+
+    async def value(v, delay=0.0):
+        await asyncio.sleep(delay)
+        return v
+
+    async def run():
+        await cache.get_or_compute("a", lambda: value("a"), [1])
+        await cache.get_or_compute("b", lambda: value("b"), [2])
+        # Computed from the snapshot as it was before the invalidation below
+        flight = asyncio.create_task(cache.get_or_compute("c", lambda: value("c", 0.05), [1]))
+        await asyncio.sleep(0.01)
+        cache.invalidate(1)
+        await flight
+        return [(await cache.get_or_compute(key, lambda: value("new"), []))[1] for key in "abc"]
+
+    assert asyncio.run(run()) == [False, True, False]
+
+def test_cancelled_waiter_leaves_the_computation_running():
+    cache = ResultCache(1 << 20)
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        owner = asyncio.create_task(cache.get_or_compute("key", slow))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get_or_compute("key", slow))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        return await owner
+
+    assert asyncio.run(run()) == ("done", False)
+    assert cache.stats()["entries"] == 1
+
+def test_result_cache_stays_within_its_size():
+    cache = ResultCache(100)
+
+    async def run():
+        for key in range(10):
+            await cache.get_or_compute(key, lambda: asyncio.sleep(0, "x" * 30))
+        await cache.get_or_compute("huge", lambda: asyncio.sleep(0, "x" * 500))
+
+    asyncio.run(run())
+    stats = cache.stats()
+    assert stats["bytes"] <= 100
+    assert stats["entries"] == 3
@@ -0,0 +1,71 @@
+import itertools
+
+import pytest
+
+from changes import change_chain, composed_changes, record_changes
+from conftest import add_snapshot
+
+# Domains come and go, get repriced, move to and from NULL, and change back
+HISTORY = [
+    {"a.com": 10, "b.com": 20, "c.com": None, "d.com": 40, "f.com": 60},
+    {"a.com": 10, "b.com": 25, "c.com": 30, "e.com": 50, "f.com": 60},
+    {"a.com": 10, "b.com": 20, "c.com": None, "d.com": 45, "e.com": 50},
+    {"a.com": 12, "b.com": 20, "e.com": 55, "f.com": None},
+    {"a.com": 10, "c.com": 30, "d.com": 40, "f.com": 61},
+]
+
+def expected_diff(old: dict, new: dict) -> dict:
+    """What /diff reports for two snapshots: a NULL price on either side is not a change."""
+    diff = {}
+    for name in old.keys() | new.keys():
+        if name not in old:
+            diff[name] = ("NEW", None, new[name])
+        elif name not in new:
+            diff[name] = ("DELETED", old[name], None)
+        elif old[name] is not None and new[name] is not None and old[name] != new[name]:
+            diff[name] = ("CHANGED", old[name], new[name])
+    return diff
+
+def composed(con, chain) -> dict:
+    source, params = composed_changes(chain)
+    rows = con.execute(f"SELECT domain, status, old_price, new_price FROM {source} c", params).fetchall()
+    return {name: (status, _float(old), _float(new)) for name, status, old, new in rows}
+
+def _float(price):
+    return None if price is None else float(price)
+
+@pytest.fixture
+def history(con):
+    return [add_snapshot(con, snapshot, f"s{i}") for i, snapshot in enumerate(HISTORY)]
+
+def test_record_changes_links_previous_completed_snapshot(con, history):
+    parents = [r[0] for r in con.execute("SELECT parent_id FROM snapshots ORDER BY id").fetchall()]
+    assert parents == [None] + history[:-1]
+    # Stores every difference, NULL price changes included, and nothing else
+    stored = con.execute("SELECT count(*) FROM snapshot_changes WHERE snapshot_id = ?", [history[1]]).fetchone()[0]
+    assert stored == 4
+
+def test_record_changes_skips_in_progress_snapshots(con, history):
+    con.execute("INSERT INTO snapshots (name, status) VALUES ('running', 'in_progress')")
+    latest = add_snapshot(con, HISTORY[0])
+    assert con.execute("SELECT parent_id FROM snapshots WHERE id = ?", [latest]).fetchone()[0] == history[-1]
+
+@pytest.mark.parametrize("a, b", list(itertools.combinations(range(len(HISTORY)), 2)))
+def test_composed_changes_match_snapshot_diff(con, history, a, b):
+    chain = change_chain(con, history[a], history[b])
+    assert chain == history[a + 1:b + 1]
+    assert composed(con, chain) == expected_diff(HISTORY[a], HISTORY[b])
+
+def test_change_chain_needs_an_ancestor(con, history):
+    assert change_chain(con, history[2], history[1]) is None
+    con.execute("UPDATE snapshots SET parent_id = NULL WHERE id = ?", [history[2]])
+    assert change_chain(con, history[0], history[3]) is None
+
+def test_record_changes_after_deleting_a_parent(con, history):
+    # What DELETE /snapshots/{id} does for the snapshots that compared against it
+    con.execute("DELETE FROM snapshot_data WHERE snapshot_id = ?", [history[2]])
+    con.execute("DELETE FROM snapshot_changes WHERE snapshot_id = ?", [history[2]])
+    con.execute("DELETE FROM snapshots WHERE id = ?", [history[2]])
+    assert record_changes(con, history[3]) == history[1]
+    assert composed(con, [history[3]]) == expected_diff(HISTORY[1], HISTORY[3])
+    assert composed(con, change_chain(con, history[0], history[4])) == expected_diff(HISTORY[0], HISTORY[4])
@@ -0,0 +1,46 @@
+from dedup import INITIAL_CAPACITY, DedupIndex, FingerprintTable, fingerprint, name_length
+
+def test_add_reports_new_domains_only():
+    seen = DedupIndex()
+    assert seen.add("Example.com")
+    assert not seen.add("example.com")
+    assert "EXAMPLE.COM" in seen
+    assert "example.net" not in seen
+    assert len(seen) == 1
+
+def test_update_and_len_match_a_set():
+    domains = [f"d{i % 700}.{'com' if i % 3 else 'net'}" for i in range(3000)]
+    seen = DedupIndex()
+    seen.update(domains)
+    assert len(seen) == len(set(domains))
+    assert all(domain in seen for domain in domains)
+
+def test_table_grows_past_its_initial_capacity():
+    table = FingerprintTable()
+    fingerprints = [fingerprint(f"domain{i}.com") for i in range(INITIAL_CAPACITY * 3)]
+    assert all(table.add(fp) for fp in fingerprints)
+    assert table.count == len(fingerprints)
+    assert table.nbytes > 8 * INITIAL_CAPACITY
+    assert all(fp in table for fp in fingerprints)
+
+def test_tables_are_per_name_length():
+    assert name_length("abc.com") == 3
+    assert name_length("ab.co.uk") == 2
+    seen = DedupIndex()
+    seen.update(["abc.com", "abd.com", "ab.com"])
+    assert seen.stats()["live_partitions"] == 2
+
+def test_release_forgets_a_length_but_keeps_counting_it():
+    seen = DedupIndex()
+    seen.update(["abc.com", "abd.com", "ab.com"])
+    peak = seen.memory_bytes()
+    seen.release(3)
+    assert "abc.com" not in seen
+    assert "ab.com" in seen
+    assert len(seen) == 3
+    stats = seen.stats()
+    assert stats["released_partitions"] == 1
+    assert stats["peak_memory_bytes"] == peak > stats["memory_bytes"]
+
+def test_fingerprint_is_never_the_empty_slot():
+    assert all(fingerprint(f"x{i}.com") != 0 for i in range(1000))
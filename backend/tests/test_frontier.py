@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+from frontier import PartitionFrontier, duplicate_stats
+
+PAGE = 5
+
+def walk(catalog, ascending, descending, frontier) -> set:
+    """Fetches pages from both ends of an ordering until the frontier says they met."""
+    fetched = set()
+    pages = {ascending: catalog, descending: catalog[::-1]}
+    for start in range(0, len(catalog), PAGE):
+        for channel, ordering in pages.items():
+            page = ordering[start:start + PAGE]
+            duplicates = sum(name in fetched for name, _ in page)
+            fetched.update(name for name, _ in page)
+            if frontier.advance(channel, page, duplicates):
+                return fetched
+    frontier.finish(ascending)
+    return fetched
+
+@pytest.mark.parametrize("seed", range(20))
+def test_price_channels_cover_the_partition_despite_ties(seed):
+    rng = random.Random(seed)
+    catalog = [(f"d{i}.com", f"${rng.choice([10, 10, 10, 95, 2495, 2495]):,}.00") for i in range(rng.randint(1, 60))]
+    # The site orders ties arbitrarily, and not the same way in both directions
+    ascending = sorted(catalog, key=lambda row: (float(row[1][1:].replace(",", "")), rng.random()))
+    descending = sorted(catalog, key=lambda row: (-float(row[1][1:].replace(",", "")), rng.random()))
+    frontier = PartitionFrontier()
+    fetched = set()
+    for start in range(0, len(catalog), PAGE):
+        for channel, ordering in (("PriceAsc", ascending), ("PriceDesc", descending)):
+            page = ordering[start:start + PAGE]
+            fetched.update(name for name, _ in page)
+            frontier.advance(channel, page)
+        if frontier.complete:
+            break
+    assert fetched == {name for name, _ in catalog}
+
+def test_price_crossing_is_strict():
+    frontier = PartitionFrontier()
+    assert not frontier.advance("PriceAsc", [("a.com", "$10.00"), ("b.com", "$95.00")])
+    # Equal edges don't prove the domains priced 95 between them were all fetched
+    assert not frontier.advance("PriceDesc", [("c.com", "$2,495.00"), ("d.com", "$95.00")])
+    assert not frontier.complete
+    assert frontier.advance("PriceAsc", [("d.com", "$95.00"), ("e.com", "$2,495.00")])
+    assert frontier.complete
+
+def test_rows_without_prices_are_ignored():
+    frontier = PartitionFrontier()
+    assert not frontier.advance("PriceAsc", [("a.com", None), ("b.com", "Make offer")])
+    assert "PriceAsc" not in frontier.price_edge
+
+def test_name_channels_meet_on_a_shared_domain():
+    catalog = [(f"{c}.com", 10) for c in "abcdefghijklmnopq"]
+    frontier = PartitionFrontier()
+    assert walk(catalog, "NameAsc", "NameDesc", frontier) == {name for name, _ in catalog}
+    assert frontier.crossed == {"name"}
+
+def test_finished_channel_completes_the_partition():
+    frontier = PartitionFrontier(["NameDesc"])
+    assert frontier.complete
+    frontier = PartitionFrontier()
+    frontier.finish("PriceDesc")
+    assert frontier.complete and not frontier.crossed
+
+def test_duplicate_stats():
+    frontiers = [PartitionFrontier(), PartitionFrontier()]
+    frontiers[0].advance("NameAsc", [("a.com", 1), ("b.com", 2)], duplicates=1)
+    frontiers[1].advance("PriceAsc", [("c.com", "$5.00"), ("d.com", "$6.00")])
+    assert duplicate_stats(frontiers) == {"rows_fetched": 4, "duplicate_rows": 1, "duplicate_ratio": 0.25}
+    assert duplicate_stats([])["duplicate_ratio"] == 0.0
@@ -0,0 +1,128 @@
+import random
+from decimal import Decimal
+
+import pytest
+
+from conftest import add_snapshot
+from database import get_db, init_db
+from main import fetch_diff, fetch_rows
+from pagination import decode_cursor, encode_cursor, keyset_condition
+from storage import seal_snapshot
+
+PAGE = 13
+
+def make_catalog(rng: random.Random, size: int) -> dict:
+    # Few distinct prices and lengths, so most pages end inside a run of ties
+    catalog = {}
+    while len(catalog) < size:
+        name = "".join(rng.choice("abcde") for _ in range(rng.randint(1, 6))) + rng.choice([".com", ".net"])
+        catalog[name] = rng.choice([None, 10, 10, 25.5, 99, 99, 1000])
+    return catalog
+
+def reprice(rng: random.Random, catalog: dict) -> dict:
+    changed = {name: price for name, price in catalog.items() if rng.random() > 0.15}
+    for name in rng.sample(sorted(changed), len(changed) // 5):
+        changed[name] = rng.choice([None, 10, 12, 99, 2000])
+    changed.update(make_catalog(rng, 20))
+    return changed
+
+@pytest.fixture(scope="module")
+def snapshots():
+    """Two full snapshots and two versioned ones holding the same catalogs."""
+    init_db()
+    rng = random.Random(21)
+    old = make_catalog(rng, 220)
+    new = reprice(rng, old)
+    with get_db() as con:
+        full_old = add_snapshot(con, old, "full old")
+        full_new = add_snapshot(con, new, "full new")
+        versioned_old = add_snapshot(con, old, "versioned old")
+        versioned_new = add_snapshot(con, new, "versioned new")
+        seal_snapshot(con, versioned_old)
+        seal_snapshot(con, versioned_new)
+    return {"full": (full_old, full_new), "versioned": (versioned_old, versioned_new)}
+
+def walk_rows(snapshot_id, filters, sort_col, sort_dir, use_cursor) -> list:
+    ids, offset, after = [], 0, None
+    while True:
+        page = fetch_rows(snapshot_id, *filters, sort_col, sort_dir, PAGE, offset, after)
+        ids += [row["domain_id"] for row in page["rows"]]
+        if use_cursor:
+            if not page["next_cursor"]:
+                return ids
+            after = decode_cursor(page["next_cursor"], sort_col, sort_dir)
+        else:
+            if len(page["rows"]) < PAGE:
+                return ids
+            offset += PAGE
+
+def walk_diff(snapshot_a, snapshot_b, diff_type, use_cursor) -> list:
+    ids, offset, after = [], 0, None
+    while True:
+        page = fetch_diff(snapshot_a, snapshot_b, diff_type, PAGE, offset, after)
+        ids += [(row["domain_id"], row["status"]) for row in page["rows"]]
+        if use_cursor:
+            if not page["next_cursor"]:
+                return ids, page["total_count"]
+            after = decode_cursor(page["next_cursor"], "domain", "asc")
+        else:
+            if len(page["rows"]) < PAGE:
+                return ids, page["total_count"]
+            offset += PAGE
+
+# (search, search_mode, min_price, max_price, min_length, max_length)
+FILTERS = [
+    ("", "contains", None, None, None, None),
+    ("ab", "contains", None, None, None, None),
+    ("abc", "contains", None, None, None, None),
+    ("a", "prefix", None, None, None, None),
+    ("ABCC.com", "exact", None, None, None, None),
+    ("", "contains", 10, 99, None, None),
+    ("", "contains", None, None, 2, 4),
+    ("b", "prefix", None, 500, 3, None),
+]
+
+@pytest.mark.parametrize("store", ["full", "versioned"])
+@pytest.mark.parametrize("sort_col", ["domain", "price_usd", "length"])
+@pytest.mark.parametrize("sort_dir", ["asc", "desc"])
+@pytest.mark.parametrize("filters", FILTERS)
+def test_cursor_walk_matches_offset(snapshots, store, sort_col, sort_dir, filters):
+    snapshot_id = snapshots[store][1]
+    by_offset = walk_rows(snapshot_id, filters, sort_col, sort_dir, use_cursor=False)
+    by_cursor = walk_rows(snapshot_id, filters, sort_col, sort_dir, use_cursor=True)
+    assert by_cursor == by_offset != []
+    assert len(set(by_cursor)) == len(by_cursor)
+    assert len(by_cursor) == fetch_rows(snapshot_id, *filters, sort_col, sort_dir, PAGE, 0, None)["total_count"]
+
+@pytest.mark.parametrize("pair", [
+    ("full", 0, "full", 1),              # stored change set
+    ("full", 1, "full", 0),              # snapshot join
+    ("versioned", 1, "versioned", 0),    # versioned_diff
+    ("full", 0, "versioned", 1),         # change chain across both stores
+    ("versioned", 1, "full", 0),         # snapshot join across both stores
+])
+@pytest.mark.parametrize("diff_type", ["all", "new", "deleted", "changed"])
+def test_diff_cursor_walk_matches_offset(snapshots, pair, diff_type):
+    snapshot_a = snapshots[pair[0]][pair[1]]
+    snapshot_b = snapshots[pair[2]][pair[3]]
+    by_offset, total = walk_diff(snapshot_a, snapshot_b, diff_type, use_cursor=False)
+    by_cursor, _ = walk_diff(snapshot_a, snapshot_b, diff_type, use_cursor=True)
+    assert by_cursor == by_offset
+    assert len(by_cursor) == total > 0
+
+def test_cursor_round_trips_null_and_decimal_values():
+    for value in (None, Decimal("25.50"), "abc.com", 4):
+        sort_col = "price_usd" if value is None or isinstance(value, Decimal) else "domain"
+        assert decode_cursor(encode_cursor(sort_col, "DESC", value, 7), sort_col, "desc") == (value, 7)
+
+def test_cursor_rejects_other_sort_order():
+    cursor = encode_cursor("price_usd", "asc", None, 1)
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, "price_usd", "desc")
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor", "price_usd", "asc")
+
+def test_keyset_after_null_only_keeps_nulls():
+    condition, params = keyset_condition("price_usd", "domain_id", "asc", None, 5)
+    assert condition == " AND price_usd IS NULL AND domain_id > ?"
+    assert params == [5]
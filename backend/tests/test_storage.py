@@ -0,0 +1,114 @@
+import pytest
+
+import snapshot_io
+import storage
+from conftest import add_snapshot
+from storage import is_versioned, remove_snapshot, seal_snapshot, snapshot_prices
+
+# Every kind of step between snapshots: unchanged, repriced, to and from NULL, removed, added back
+HISTORY = [
+    {"a.com": 10, "b.com": 20, "c.com": None, "d.com": 40},
+    {"a.com": 10, "b.com": 25, "c.com": 30, "e.com": 50},
+    {"a.com": 10, "b.com": 20, "c.com": None, "d.com": 45, "e.com": 50},
+    {"a.com": 12, "e.com": 50},
+]
+
+def prices(con, snapshot_id: int) -> dict:
+    source, params = snapshot_prices(con, snapshot_id)
+    rows = con.execute(f"SELECT d.name, p.price_usd FROM {source} p JOIN domains d ON d.id = p.domain_id", params).fetchall()
+    return {name: None if price is None else float(price) for name, price in rows}
+
+def versions(con) -> list:
+    return con.execute("SELECT * FROM domain_versions ORDER BY ALL").fetchall()
+
+@pytest.fixture
+def history(con):
+    return [add_snapshot(con, snapshot, f"s{i}") for i, snapshot in enumerate(HISTORY)]
+
+def test_seal_keeps_every_snapshot(con, history):
+    for snapshot_id in history:
+        assert seal_snapshot(con, snapshot_id)
+        assert is_versioned(con, snapshot_id)
+    assert con.execute("SELECT count(*) FROM snapshot_data").fetchone()[0] == 0
+    for snapshot_id, expected in zip(history, HISTORY):
+        assert prices(con, snapshot_id) == expected
+
+def test_seal_is_idempotent(con, history):
+    seal_snapshot(con, history[0])
+    before = versions(con)
+    assert seal_snapshot(con, history[0])
+    assert versions(con) == before
+
+def test_seal_refuses_snapshot_older_than_latest_versioned(con, history):
+    seal_snapshot(con, history[1])
+    assert not seal_snapshot(con, history[0])
+    assert not is_versioned(con, history[0])
+    assert prices(con, history[0]) == HISTORY[0]
+
+@pytest.mark.parametrize("removed", range(len(HISTORY)))
+def test_remove_versioned_snapshot_keeps_the_others(con, history, removed):
+    for snapshot_id in history:
+        seal_snapshot(con, snapshot_id)
+    remove_snapshot(con, history[removed])
+    con.execute("DELETE FROM snapshots WHERE id = ?", [history[removed]])
+    for i, snapshot_id in enumerate(history):
+        if i != removed:
+            assert prices(con, snapshot_id) == HISTORY[i]
+    # No version is left pointing at the removed snapshot
+    assert con.execute("SELECT count(*) FROM domain_versions WHERE ? IN (valid_from, valid_to)",
+                       [history[removed]]).fetchone()[0] == 0
+
+def test_remove_then_seal_again(con, history):
+    for snapshot_id in history:
+        seal_snapshot(con, snapshot_id)
+    remove_snapshot(con, history[-1])
+    con.execute("DELETE FROM snapshots WHERE id = ?", [history[-1]])
+    replacement = add_snapshot(con, HISTORY[-1])
+    assert seal_snapshot(con, replacement)
+    for snapshot_id, expected in zip(history[:-1] + [replacement], HISTORY):
+        assert prices(con, snapshot_id) == expected
+
+def test_remove_full_snapshot(con, history):
+    remove_snapshot(con, history[1])
+    assert prices(con, history[1]) == {}
+    assert prices(con, history[2]) == HISTORY[2]
+
+def test_failed_import_leaves_versions_alone(con, history, tmp_path, monkeypatch):
+    for snapshot_id in history:
+        seal_snapshot(con, snapshot_id)
+    path = str(tmp_path / "snapshot.parquet")
+    snapshot_io.export_snapshot(con, history[1], path)
+    before = versions(con)
+    snapshots = con.execute("SELECT * FROM snapshots ORDER BY id").fetchall()
+
+    def seal_then_fail(con, snapshot_id):
+        assert seal_snapshot(con, snapshot_id)
+        raise RuntimeError("failed after sealing")
+    monkeypatch.setattr(snapshot_io, "store_completed", seal_then_fail)
+    with pytest.raises(RuntimeError):
+        snapshot_io.import_snapshot(con, path)
+
+    assert versions(con) == before
+    assert con.execute("SELECT * FROM snapshots ORDER BY id").fetchall() == snapshots
+    assert con.execute("SELECT count(*) FROM snapshot_data").fetchone()[0] == 0
+
+def test_import_round_trip(con, history, tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_ENGINE", "versioned")
+    path = str(tmp_path / "snapshot.parquet")
+    header = snapshot_io.export_snapshot(con, history[2], path)
+    snapshot_id, row_count = snapshot_io.import_snapshot(con, path)
+    assert row_count == header["row_count"] == len(HISTORY[2])
+    assert is_versioned(con, snapshot_id)
+    assert prices(con, snapshot_id) == HISTORY[2]
+
+def test_removing_down_to_an_older_snapshot_reopens_its_versions(con, history):
+    for snapshot_id in history:
+        seal_snapshot(con, snapshot_id)
+    for removed in (history[2], history[3]):
+        remove_snapshot(con, removed)
+        con.execute("DELETE FROM snapshots WHERE id = ?", [removed])
+    open_versions = con.execute("""
+        SELECT d.name, v.price_usd FROM domain_versions v JOIN domains d ON d.id = v.domain_id
+        WHERE v.valid_to IS NULL
+    """).fetchall()
+    assert {name: None if price is None else float(price) for name, price in open_versions} == HISTORY[1]
@@ -0,0 +1,56 @@
+import pytest
+
+import trigram
+from conftest import add_snapshot
+from database import get_db, init_db
+from main import fetch_rows
+from trigram import catch_up, contains_matches, trigrams
+
+NAMES = ["abcab.com", "cabc.net", "xabcx.com", "abc.com", "zzz.com", "abcabc.org", "qabcq.net"]
+
+def ids(con, names) -> list:
+    return sorted(r[0] for r in con.execute(f"SELECT id FROM domains WHERE name IN ({','.join('?' for _ in names)})", names).fetchall())
+
+def test_trigrams():
+    assert trigrams("abcab") == ["abc", "bca", "cab"]
+    assert trigrams("ab") == []
+
+def test_contains_checks_names_not_just_trigrams(con):
+    add_snapshot(con, dict.fromkeys(NAMES, 10))
+    # "abcab" holds every trigram of "cabc" without containing it
+    assert contains_matches(con, "cabc") == ids(con, ["cabc.net", "abcabc.org"])
+    assert contains_matches(con, "ABC") == ids(con, [n for n in NAMES if "abc" in n])
+    assert contains_matches(con, "nomatch") == []
+
+@pytest.mark.parametrize("search", ["ab", "a%c", "ab_c", "a\\bc"])
+def test_short_and_wildcard_searches_fall_back(con, search):
+    add_snapshot(con, dict.fromkeys(NAMES, 10))
+    assert contains_matches(con, search) is None
+
+def test_too_many_candidates_fall_back(con, monkeypatch):
+    add_snapshot(con, dict.fromkeys(NAMES, 10))
+    monkeypatch.setattr(trigram, "MAX_CANDIDATES", 3)
+    assert contains_matches(con, "abc") is None
+    assert contains_matches(con, "cabc") == ids(con, ["cabc.net", "abcabc.org"])
+
+def test_catch_up_indexes_unindexed_domains(con):
+    add_snapshot(con, dict.fromkeys(NAMES, 10))
+    # As left by a write that failed between inserting domains and indexing them
+    con.execute("INSERT INTO domains (name, length) VALUES ('late-abc.com', 8)")
+    assert contains_matches(con, "late") == []
+    assert catch_up(con) == len(trigrams("late-abc.com"))
+    assert contains_matches(con, "late") == ids(con, ["late-abc.com"])
+
+def test_overflow_returns_the_same_rows_as_the_index(monkeypatch):
+    init_db()
+    with get_db() as con:
+        snapshot_id = add_snapshot(con, {f"tri{i}{name}": i for i, name in enumerate(NAMES)}, "trigram")
+
+    def rows():
+        page = fetch_rows(snapshot_id, "abc", "contains", None, None, None, None, "domain", "asc", 100, 0, None)
+        return page["total_count"], [row["domain"] for row in page["rows"]]
+
+    indexed = rows()
+    monkeypatch.setattr(trigram, "MAX_CANDIDATES", 1)
+    assert rows() == indexed
+    assert indexed[0] == 6
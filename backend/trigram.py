@@ -0,0 +1,59 @@
+from typing import Optional
+
+# domain_trigrams holds one (trigram, domain_id) row per distinct 3-character substring
+# of every domain name. Like snapshot_data it has no ART index: it is written in runs
+# sorted by trigram, so a lookup only reads the row groups whose zone maps hold it.
+
+# Contains searches matching more candidates than this scan instead. The candidates become
+# an IN list filtering snapshot_data, which is sorted by domain_id, and its cost grows
+# with the list: on a 100k-row snapshot 2048 ids take 15-25ms against ~30ms for an ILIKE
+# scan, and 4096 already cost as much as the scan
+MAX_CANDIDATES = 2048
+# ILIKE wildcards; a search containing them can't be split into literal trigrams
+WILDCARDS = ("%", "_", "\\")
+
+def domain_watermark(con) -> int:
+    """Highest domain id so far; index_domains(con, it) covers domains inserted after this."""
+    return con.execute("SELECT COALESCE(max(id), 0) FROM domains").fetchone()[0]
+
+def index_domains(con, after_id: int):
+    """Adds the trigrams of domains with an id above after_id."""
+    con.execute("""
+        INSERT INTO domain_trigrams (trigram, domain_id)
+        SELECT DISTINCT substr(name, i, 3), id
+        FROM (SELECT id, name, unnest(range(1, length(name) - 1)) AS i FROM domains WHERE id > ?)
+        ORDER BY 1, 2
+    """, [after_id])
+
+def catch_up(con) -> int:
+    """
+    Indexes domains added since the newest indexed one, e.g. by a write that failed
+    between inserting domains and indexing them. Returns the number of new rows.
+    """
+    before = con.execute("SELECT count(*) FROM domain_trigrams").fetchone()[0]
+    indexed = con.execute("SELECT COALESCE(max(domain_id), 0) FROM domain_trigrams").fetchone()[0]
+    index_domains(con, indexed)
+    return con.execute("SELECT count(*) FROM domain_trigrams").fetchone()[0] - before
+
+def trigrams(text: str) -> list:
+    return sorted({text[i:i + 3] for i in range(len(text) - 2)})
+
+def contains_matches(con, search: str) -> Optional[list]:
+    """
+    Ids of the domains whose name contains search, looked up through their trigrams,
+    or None when the index can't narrow it down (short or wildcard searches, or more
+    than MAX_CANDIDATES candidates) and a scan should be used instead.
+    """
+    search = search.lower()
+    grams = trigrams(search)
+    if not grams or any(c in search for c in WILDCARDS):
+        return None
+    lookups = " INTERSECT ".join("SELECT domain_id FROM domain_trigrams WHERE trigram = ?" for _ in grams)
+    candidates = [r[0] for r in con.execute(f"SELECT domain_id FROM ({lookups}) LIMIT {MAX_CANDIDATES + 1}", grams).fetchall()]
+    if len(candidates) > MAX_CANDIDATES:
+        return None
+    if not candidates:
+        return []
+    # Sharing every trigram doesn't make a match ("abcab" has all of "cabc"'s), so names are checked
+    names = con.execute(f"SELECT id, name FROM domains WHERE id IN ({','.join(map(str, candidates))})").fetchall()
+    return sorted(domain_id for domain_id, name in names if search in name.lower())
@@ -13,6 +13,7 @@ interface Snapshot {
   name: string;
   created_at: string;
   row_count: number;
+  status: string;
 }
 
 function App() {
@@ -35,6 +36,13 @@ function App() {
     }
   }, [activeTab]);
 
+  // In-progress snapshots keep growing while their scrape publishes
+  useEffect(() => {
+    if (activeTab === "scraper" || !snapshots.some(s => s.status === "in_progress")) return;
+    const interval = setInterval(() => fetchSnapshots(), 10000);
+    return () => clearInterval(interval);
+  }, [activeTab, snapshots]);
+
   const fetchSnapshots = async (deletedId?: number) => {
     try {
       const res = await axios.get(`${API_BASE}/snapshots`);
@@ -127,7 +135,7 @@ function App() {
                 >
                   {snapshots.map(s => (
                     <option key={s.id} value={s.id}>
-                      {s.name} ({s.row_count.toLocaleString()} rows)
+                      {s.name} ({s.row_count.toLocaleString()} rows{s.status === "in_progress" ? ", in progress" : ""})
                     </option>
                   ))}
                 </select>
@@ -64,6 +64,9 @@ const DiffGrid = ({ snapshotA, snapshotB, onOpenHistory }: DiffGridProps) => {
     ];
 
     const dataSource: IDatasource = useMemo(() => {
+        // Cursor that continues after the block ending at each row; blocks reached by
+        // scrolling use it, jumps fall back to the offset
+        const cursors = new Map<number, string>();
         return {
             rowCount: undefined,
             getRows: async (params: IGetRowsParams) => {
@@ -73,10 +76,14 @@ const DiffGrid = ({ snapshotA, snapshotB, onOpenHistory }: DiffGridProps) => {
                             snapshot_a: snapshotA,
                             snapshot_b: snapshotB,
                             diff_type: diffType,
+                            cursor: cursors.get(params.startRow),
                             offset: params.startRow,
                             limit: params.endRow - params.startRow
                         }
                     });
+                    if (res.data.next_cursor) {
+                        cursors.set(params.endRow, res.data.next_cursor);
+                    }
 
                     const lastRow = res.data.rows.length < (params.endRow - params.startRow)
                         ? params.startRow + res.data.rows.length
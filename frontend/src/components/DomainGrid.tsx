@@ -72,6 +72,9 @@ const DomainGrid = ({ snapshotId, onOpenHistory }: DomainGridProps) => {
     ];
 
     const dataSource: IDatasource = useMemo(() => {
+        // Cursor that continues after the block ending at each row, per sort order; blocks
+        // reached by scrolling use it, jumps fall back to the offset
+        const cursors = new Map<string, string>();
         return {
             rowCount: undefined,
             getRows: async (params: IGetRowsParams) => {
@@ -82,6 +85,7 @@ const DomainGrid = ({ snapshotId, onOpenHistory }: DomainGridProps) => {
                     // Allow clicking column headers to override dropdown
                     const finalSortCol = sortModel ? sortModel.colId : sortColState;
                     const finalSortDir = sortModel ? sortModel.sort : sortDirState;
+                    const cursorKey = (row: number) => `${finalSortCol}-${finalSortDir}-${row}`;
 
                     const res = await axios.get(`${API_BASE}/rows`, {
                         params: {
@@ -94,10 +98,14 @@ const DomainGrid = ({ snapshotId, onOpenHistory }: DomainGridProps) => {
                             max_price: debouncedMaxPrice ? parseFloat(debouncedMaxPrice) : undefined,
                             min_length: debouncedMinLength ? parseInt(debouncedMinLength, 10) : undefined,
                             max_length: debouncedMaxLength ? parseInt(debouncedMaxLength, 10) : undefined,
+                            cursor: cursors.get(cursorKey(params.startRow)),
                             offset: params.startRow,
                             limit: params.endRow - params.startRow
                         }
                     });
+                    if (res.data.next_cursor) {
+                        cursors.set(cursorKey(params.endRow), res.data.next_cursor);
+                    }
 
                     const lastRow = res.data.rows.length < (params.endRow - params.startRow)
                         ? params.startRow + res.data.rows.length
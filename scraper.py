@@ -1,11 +1,23 @@
 import csv
 import asyncio
+import functools
 import re
 import argparse
 import aiosqlite
 import datetime
-from bs4 import BeautifulSoup
-from curl_cffi.requests import AsyncSession
+import os
+import sys
+import time
+
+# Shared scraping helpers live next to the API service
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from session_pool import SessionPool
+from concurrency import AdaptiveLimiter, timed_request
+from rate_limit import TokenBucket, RetryBudget, backoff_delay
+from html_extract import extract_rows, extract_response_stream, parse_page_count, ENGINES
+from frontier import PartitionFrontier, duplicate_stats
+from dedup import DedupIndex
+from planner import plan_partitions, stream_channels, band_key, band_params, estimate_count, is_soft_block, ALL_LENGTHS
 
 # Configuration
 BASE_URL = "https://www.hugedomains.com/domain_search.cfm"
@@ -28,8 +40,20 @@ PROXIES = {
 
 RECORDS_PER_PAGE = 500
 
-async def get_or_create_scan(db_path):
-    """Creates a new scan record in the database and returns the scan_id."""
+# Page size of the planner's count probes; the count is read off "Page 1 of N"
+PROBE_ROWS = 10
+
+# Session pool: rotate a connection's proxy exit IP after this many requests / seconds
+SESSION_ROTATE_EVERY = 25
+SESSION_MAX_AGE = 120
+
+# HTML parser engine (see backend/html_extract.py); None uses HTML_PARSER_ENGINE or "fast"
+PARSER_ENGINE = None
+# Parse result pages incrementally as the body downloads (--stream-parse)
+STREAM_PARSE = False
+
+async def get_or_create_scan(db_path, resume_scan_id=None):
+    """Creates a new scan record in the database (or reopens one to resume) and returns the scan_id."""
     async with aiosqlite.connect(db_path) as db:
         await db.execute("PRAGMA journal_mode=WAL")
         await db.execute('''
@@ -45,14 +69,49 @@ async def get_or_create_scan(db_path):
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 domain_name TEXT NOT NULL,
                 price TEXT,
+                price_numeric REAL,
                 length INTEGER,
                 scan_id INTEGER,
                 FOREIGN KEY(scan_id) REFERENCES scans(id),
                 UNIQUE(domain_name, scan_id)
             )
         ''')
+        # Databases created before the numeric price was stored lack its column
+        async with db.execute("PRAGMA table_info(domains)") as cursor:
+            columns = {row[1] async for row in cursor}
+        if "price_numeric" not in columns:
+            await db.execute("ALTER TABLE domains ADD COLUMN price_numeric REAL")
+        # Cursor of every (length, price band, sort channel) stream, committed together with its rows.
+        # The planner writes a row per planned stream up front, so a resume replays the same plan.
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS stream_checkpoints (
+                scan_id INTEGER,
+                length INTEGER,
+                band TEXT NOT NULL DEFAULT '',
+                sort_direction TEXT,
+                start_index INTEGER,
+                next_token TEXT,
+                done INTEGER DEFAULT 0,
+                abandoned INTEGER DEFAULT 0,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (scan_id, length, band, sort_direction)
+            )
+        ''')
+        # A stream that stopped before its end (302 or an empty page) is abandoned: it never
+        # counts as having covered its partition, and a resume walks it again from the start
+        async with db.execute("PRAGMA table_info(stream_checkpoints)") as cursor:
+            columns = {row[1] async for row in cursor}
+        if "abandoned" not in columns:
+            await db.execute("ALTER TABLE stream_checkpoints ADD COLUMN abandoned INTEGER DEFAULT 0")
         await db.commit()
         
+        if resume_scan_id is not None:
+            cursor = await db.execute("UPDATE scans SET status = 'scraping' WHERE id = ?", (resume_scan_id,))
+            await db.commit()
+            if cursor.rowcount == 0:
+                raise ValueError(f"Scan {resume_scan_id} does not exist")
+            return resume_scan_id
+        
         cursor = await db.execute(
             "INSERT INTO scans (total_extracted, status) VALUES (?, ?)", 
             (0, 'scraping')
@@ -60,8 +119,33 @@ async def get_or_create_scan(db_path):
         await db.commit()
         return cursor.lastrowid
 
-async def save_to_sqlite(db_path, scan_id, data):
-    """Saves the extracted domains directly into SQLite."""
+async def load_checkpoints(db_path, scan_id, seen):
+    """
+    Returns {(length, band, sort_direction): (start_index, next_token, done, abandoned)} and adds the
+    domains already saved for the scan to `seen`.
+    """
+    async with aiosqlite.connect(db_path) as db:
+        async with db.execute(
+            "SELECT length, band, sort_direction, start_index, next_token, done, abandoned FROM stream_checkpoints WHERE scan_id = ?",
+            (scan_id,)
+        ) as cursor:
+            checkpoints = {(row[0], row[1], row[2]): (row[3], row[4], bool(row[5]), bool(row[6])) async for row in cursor}
+        async with db.execute("SELECT domain_name FROM domains WHERE scan_id = ?", (scan_id,)) as cursor:
+            async for row in cursor:
+                seen.add(row[0])
+    return checkpoints
+
+async def save_plan(db_path, scan_id, partitions):
+    """Records an initial checkpoint for every planned (length, band, sort) stream."""
+    async with aiosqlite.connect(db_path) as db:
+        await db.executemany(
+            "INSERT OR IGNORE INTO stream_checkpoints (scan_id, length, band, sort_direction, start_index, next_token, done) VALUES (?, ?, ?, ?, 1, '', 0)",
+            [(scan_id, length, band, sort_dir) for length, band, channels in partitions for sort_dir in channels]
+        )
+        await db.commit()
+
+def format_domains(scan_id, data):
+    """Maps extracted (domain_name, price) pairs to rows of the domains table."""
     # data format: [(domain_name, price), ...]
     # we need [(domain_name, price, price_numeric, length, scan_id)]
     formatted_data = []
@@ -77,165 +161,487 @@ async def save_to_sqlite(db_path, scan_id, data):
             price_numeric = 0.0
 
         formatted_data.append((domain, price, price_numeric, name_length, scan_id))
+    return formatted_data
 
-    async with aiosqlite.connect(db_path, timeout=30.0) as db:
-        await db.execute("PRAGMA journal_mode=WAL")
-        await db.execute("PRAGMA synchronous=NORMAL")
-        await db.executemany(
+class SqliteSink:
+    """
+    The only writer of a scan. Streams hand over their pages through a bounded queue
+    (put() blocks while it is full, which slows the fetchers down to what the disk can
+    take), and a single task writes them over one long-lived connection, committing a
+    batch once it holds `batch_rows` rows or `flush_interval` seconds have passed.
+
+    A page's stream checkpoint is committed in the same transaction as its rows, so a
+    crash loses whole pages together with their cursors and a resume refetches them.
+    """
+    def __init__(self, db_path, scan_id, max_pages=64, batch_rows=5000, flush_interval=1.0):
+        self.db_path = db_path
+        self.scan_id = scan_id
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pages)
+        self._db = None
+        self._task = None
+        self.error = None
+
+        self.pages: int = 0
+        self.rows_written: int = 0
+        self.commits: int = 0
+        self.write_seconds: float = 0.0
+        self.backpressure_waits: int = 0
+
+    async def start(self):
+        self._db = await aiosqlite.connect(self.db_path, timeout=30.0)
+        await self._db.execute("PRAGMA journal_mode=WAL")
+        await self._db.execute("PRAGMA synchronous=NORMAL")
+        self._task = asyncio.create_task(self._run())
+
+    async def put(self, data, checkpoint=None):
+        """
+        Queues a page of (domain_name, price) pairs and the stream's new
+        (length, band, sort_direction, start_index, next_token, done, abandoned) checkpoint.
+        """
+        if self.error is not None:
+            raise RuntimeError(f"SQLite writer failed: {self.error}")
+        if self._queue.full():
+            self.backpressure_waits += 1
+        await self._queue.put((data, checkpoint))
+
+    async def _next_batch(self):
+        """Waits for a page, then gathers more until the batch is full or the interval ends."""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        rows = len(batch[0][0]) if batch[0] else 0
+        deadline = loop.time() + self.flush_interval
+        while batch[-1] is not None and rows < self.batch_rows:
+            if self._queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self._queue.get_nowait()
+            batch.append(item)
+            if item is not None:
+                rows += len(item[0])
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            closing = batch[-1] is None
+            pages = [item for item in batch if item is not None]
+            if pages and self.error is None:
+                try:
+                    await self._write(pages)
+                except Exception as e:
+                    # Keep draining the queue so blocked streams fail instead of hanging
+                    self.error = e
+                    print(f"[!] SQLite writer failed: {e}")
+            if closing:
+                return
+
+    async def _write(self, pages):
+        started = time.monotonic()
+        rows = []
+        checkpoints = {}
+        for data, checkpoint in pages:
+            rows.extend(format_domains(self.scan_id, data))
+            if checkpoint is not None:
+                # Later pages of a stream supersede its earlier cursors
+                checkpoints[checkpoint[:3]] = checkpoint
+        await self._db.executemany(
             "INSERT OR IGNORE INTO domains (domain_name, price, price_numeric, length, scan_id) VALUES (?, ?, ?, ?, ?)",
-            formatted_data
+            rows
         )
-        await db.commit()
+        await self._db.executemany(
+            "INSERT OR REPLACE INTO stream_checkpoints (scan_id, length, band, sort_direction, start_index, next_token, done, abandoned, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+            [(self.scan_id, length, band, sort_direction, start_index, next_token, int(done), int(abandoned))
+             for length, band, sort_direction, start_index, next_token, done, abandoned in checkpoints.values()]
+        )
+        await self._db.commit()
+        self.pages += len(pages)
+        self.rows_written += len(rows)
+        self.commits += 1
+        self.write_seconds += time.monotonic() - started
+
+    async def close(self):
+        """Flushes everything still queued and closes the connection."""
+        if self._task is not None:
+            await self._queue.put(None)
+            await self._task
+        if self._db is not None:
+            await self._db.close()
+        if self.error is not None:
+            print("[!] Some pages were not written; resume the scan to fetch them again.")
+
+    def stats(self) -> dict:
+        return {
+            "pages": self.pages,
+            "rows_written": self.rows_written,
+            "commits": self.commits,
+            "rows_per_commit": round(self.rows_written / self.commits, 1) if self.commits else 0.0,
+            "insert_rows_per_s": round(self.rows_written / self.write_seconds) if self.write_seconds else 0,
+            "backpressure_waits": self.backpressure_waits,
+        }
 
+def search_params(length, band, sort_direction, maxrows=RECORDS_PER_PAGE, start_index=1):
+    """Query string of one search page for a length, price band and sort order."""
+    params = {
+        "maxrows": maxrows,
+        "start": start_index,
+        "anchor": "all",
+        "length_start": length,
+        "length_end": length,
+        "highlightbg": 1,
+        "catsearch": 0,
+        "sort": sort_direction
+    }
+    params.update(band_params(band))
+    return params
 
 def parse_html_and_next(html_content):
     """Extracts domains, prices, and the next 'n' cursor from HTML content."""
-    soup = BeautifulSoup(html_content, "html.parser")
-    domain_rows = soup.find_all("div", class_="domain-row")
-    
-    extracted_data = []
-    
-    for row in domain_rows:
-        domain_link = row.select_one("span.domain > a.link")
-        price_span = row.select_one("span.domain > span.price")
-        
-        if domain_link and price_span:
-            domain_name = domain_link.text.strip()
-            price = price_span.text.strip()
-            extracted_data.append((domain_name, price))
-            
-    # Extract the 'n' cursor token for the next page explicitly matching the Next button
-    next_token = None
-    next_link = soup.select_one("a.next-link, a.next-serch-link")
-    if next_link and next_link.has_attr('href'):
-        match = re.search(r'n=([^&"]+)', next_link['href'])
-        if match:
-            next_token = match.group(1)
-            
-    return extracted_data, next_token
+    return extract_rows(html_content, PARSER_ENGINE)
+
+async def fetch_page(pool, params):
+    """
+    Fetches one result page and returns (status_code, domains, next_token). domains is
+    None for an empty page without its "Page X of N" banner, which is a soft block
+    rather than an empty result set.
+    """
+    if STREAM_PARSE:
+        async with pool.stream(BASE_URL, params=params) as response:
+            if response.status_code != 200:
+                return response.status_code, None, None
+            domains, next_token, page_count = await extract_response_stream(response, PARSER_ENGINE)
+            if is_soft_block(len(domains), page_count):
+                return 200, None, None
+            return 200, domains, next_token
 
-GLOBAL_SEEN = set()
+    # Pooled keep-alive session; the pool rotates the proxy exit IP on blocks
+    response = await pool.get(BASE_URL, params=params)
+    if response.status_code != 200:
+        return response.status_code, None, None
+    domains, next_token = parse_html_and_next(response.text)
+    if is_soft_block(len(domains), parse_page_count(response.text)):
+        return 200, None, None
+    return 200, domains, next_token
 
-async def fetch_stream(length, sort_direction, db_path, scan_id):
-    """Sequentially fetches all pages for a specific direction and length."""
-    start_index = 1
-    next_token = ""
+GLOBAL_SEEN = DedupIndex()
+# Free a length's dedup table once all its streams have finished (--release-finished)
+RELEASE_FINISHED = False
+
+async def probe_count(pool, limiter, rate_limiter, length, price_from=None, price_to=None, max_retries=5):
+    """Estimates how many domains a length / price band holds, or None if the probe fails."""
+    params = search_params(length, band_key(price_from, price_to), "PriceAsc", maxrows=PROBE_ROWS)
+    for attempt in range(max_retries):
+        failure = "error"
+        try:
+            await rate_limiter.acquire()
+            async with timed_request(limiter) as outcome:
+                response = await pool.get(BASE_URL, params=params)
+                outcome["status"] = response.status_code
+            if response.status_code == 200:
+                domains, _ = parse_html_and_next(response.text)
+                page_count = parse_page_count(response.text)
+                if not is_soft_block(len(domains), page_count):
+                    return estimate_count(page_count, len(domains), PROBE_ROWS)
+                print(f"[!] L={length} probe got an empty page without results banner (Attempt {attempt+1}/{max_retries})")
+                failure = "blocked"
+            else:
+                failure = "blocked" if response.status_code in (403, 429) else "status"
+        except Exception as e:
+            print(f"[!] L={length} probe error (Attempt {attempt+1}/{max_retries}): {e}")
+        if attempt < max_retries - 1:
+            await asyncio.sleep(backoff_delay(attempt, failure))
+    return None
+
+async def fetch_stream(length, band, sort_direction, frontier, pool, limiter, rate_limiter, retry_budget, sink,
+                       start_index=1, next_token=""):
+    """
+    Sequentially fetches all pages for a specific direction, length and price band,
+    starting from a checkpointed cursor when resuming. Returns True once the stream has
+    been exhausted or has met the opposite sort channel in the partition's frontier, and
+    False if it gave up or was abandoned before its end.
+    """
     total_extracted = 0
+    label = f"L={length} ${band}" if band else f"L={length}"
     
     while True:
-        params = {
-            "maxrows": RECORDS_PER_PAGE,
-            "start": start_index,
-            "anchor": "all",
-            "length_start": length,
-            "length_end": length,
-            "highlightbg": 1,
-            "catsearch": 0,
-            "sort": sort_direction
-        }
+        if frontier.complete:
+            print(f"[*] {label} | '{sort_direction}' partition fully covered by the other channels. Stopping stream.")
+            await sink.put([], (length, band, sort_direction, start_index, next_token, True, False))
+            return True
+
+        params = search_params(length, band, sort_direction, start_index=start_index)
         
         if next_token:
             params["n"] = next_token
 
         success = False
+        soft_blocked = False
         max_retries = 20
+        first_failure_at = None
         for attempt in range(max_retries):
+            failure = "error"
+            # Only the request is retried; a failed write below aborts the scan instead
             try:
-                # Create a fresh session for EVERY request to force proxy rotation!
-                async with AsyncSession(impersonate="chrome120", proxies=PROXIES, headers=HEADERS, timeout=45) as session:
-                    response = await session.get(BASE_URL, params=params)
-                    
-                    if response.status_code == 200:
-                        domains, next_token = parse_html_and_next(response.text)
-                        
-                        if domains:
-                            new_domains = []
-                            overlap_count = 0
-                            for domain, price in domains:
-                                if domain in GLOBAL_SEEN:
-                                    overlap_count += 1
-                                else:
-                                    new_domains.append((domain, price))
-                                    GLOBAL_SEEN.add(domain)
-                            
-                            if new_domains:
-                                await save_to_sqlite(db_path, scan_id, new_domains)
-                                total_extracted += len(new_domains)
-                                print(f"[+] L={length} | '{sort_direction}' | start={start_index:<6} | New: {len(new_domains):<3} | Overlap: {overlap_count:<3} | NextToken: {bool(next_token):<1} | Total DB: {len(GLOBAL_SEEN)}")
-                            else:
-                                print(f"[*] L={length} | '{sort_direction}' | start={start_index:<6} | All {len(domains)} domains overlapped. Total DB: {len(GLOBAL_SEEN)}")
-                                
-                            # If a page contains a huge overlap, they've met in the middle. Safely stop this stream.
-                            if overlap_count > RECORDS_PER_PAGE * 0.8:
-                                print(f"[*] L={length} | '{sort_direction}' hit massive overlap (>80%). Stopping stream to save requests.")
-                                return # Exit this stream completely
-                            
-                            # Increment start index mirroring HugeDomains parameters
-                            if start_index == 1:
-                                start_index = RECORDS_PER_PAGE
-                            else:
-                                start_index += RECORDS_PER_PAGE
-                        else:
-                            print(f"[*] L={length} | '{sort_direction}' No domains found. Reached the end.")
-                            next_token = None
-                            
-                        success = True
-                        break
-                    elif response.status_code == 302:
-                        print(f"[-] L={length} | '{sort_direction}' Hit 302 redirect. Token expired or end reached.")
-                        return # Exit stream
-                    elif response.status_code in [403, 429]:
-                        print(f"[!] Warning: L={length} | '{sort_direction}' start={start_index} returned {response.status_code} (Proxy Block). Retrying ({attempt+1}/{max_retries})...")
-                    else:
-                        print(f"[!] Warning: L={length} | '{sort_direction}' start={start_index} returned {response.status_code}. Retrying ({attempt+1}/{max_retries})...")
+                await rate_limiter.acquire()
+                async with timed_request(limiter) as outcome:
+                    status_code, domains, page_token = await fetch_page(pool, params)
+                    outcome["status"] = status_code
             except Exception as e:
-                print(f"[!] L={length} | '{sort_direction}' Error starting at {start_index} (Attempt {attempt+1}/{max_retries}): {e}")
+                status_code = None
+                print(f"[!] {label} | '{sort_direction}' Error starting at {start_index} (Attempt {attempt+1}/{max_retries}): {e}")
+
+            soft_blocked = status_code == 200 and domains is None
+            if soft_blocked:
+                # A soft block, not the end of the chain: retried like a 403
+                failure = "blocked"
+                print(f"[!] Warning: {label} | '{sort_direction}' start={start_index} returned an empty page without results banner (Soft Block). Retrying ({attempt+1}/{max_retries})...")
+            elif status_code == 200:
+                retry_budget.record_success(first_failure_at)
+                success = True
+                break
+            elif status_code == 302:
+                print(f"[-] {label} | '{sort_direction}' Hit 302 redirect (token expired). Abandoning stream; resumable.")
+                await sink.put([], (length, band, sort_direction, start_index, None, False, True))
+                return False
+            elif status_code in [403, 429]:
+                failure = "blocked"
+                print(f"[!] Warning: {label} | '{sort_direction}' start={start_index} returned {status_code} (Proxy Block). Retrying ({attempt+1}/{max_retries})...")
+            elif status_code is not None:
+                failure = "status"
+                print(f"[!] Warning: {label} | '{sort_direction}' start={start_index} returned {status_code}. Retrying ({attempt+1}/{max_retries})...")
                 
-            await asyncio.sleep(3)
+            if attempt == max_retries - 1:
+                break
+            retry_budget.record_failure()
+            if first_failure_at is None:
+                first_failure_at = time.monotonic()
+            if not retry_budget.allow_retry():
+                print(f"[!] {label} | '{sort_direction}' Scan retry budget exhausted at start={start_index}.")
+                break
+            await asyncio.sleep(backoff_delay(attempt, failure))
             
-        if not success or not next_token:
-            print(f"[-] L={length} | '{sort_direction}' Stream stopping (no token or max retries hit).")
-            break
+        if not success and soft_blocked:
+            # Still soft blocked: the stream is abandoned, not finished
+            print(f"[-] {label} | '{sort_direction}' Empty page without results banner at start={start_index}. Abandoning stream; resumable.")
+            await sink.put([], (length, band, sort_direction, start_index, next_token, False, True))
+            return False
+        if not success:
+            print(f"[-] {label} | '{sort_direction}' Stream stopping at start={start_index} (max retries hit); resumable.")
+            return False
+
+        next_token = page_token
+        page_start = start_index
+        new_domains = []
+        page_seen = set()
+        overlap_count = 0
+        
+        for domain, price in domains:
+            if domain in GLOBAL_SEEN or domain in page_seen:
+                overlap_count += 1
+            else:
+                page_seen.add(domain)
+                new_domains.append((domain, price))
+        
+        # Increment start index mirroring HugeDomains parameters
+        if start_index == 1:
+            start_index = RECORDS_PER_PAGE
+        else:
+            start_index += RECORDS_PER_PAGE
+        
+        # Stop on the exact page where this channel crosses its opposite
+        met_in_middle = frontier.advance(sort_direction, domains, overlap_count)
+        if not next_token:
+            frontier.finish(sort_direction)
+        done = met_in_middle or not next_token
+        
+        # Rows and the advanced cursor are committed together, so a resumed scan starts at the next page.
+        # Domains only count as seen once queued: if the writer has failed, a resume fetches them again
+        await sink.put(new_domains, (length, band, sort_direction, start_index, next_token, done, False))
+        GLOBAL_SEEN.update(page_seen)
+        
+        if new_domains:
+            total_extracted += len(new_domains)
+            print(f"[+] {label} | '{sort_direction}' | start={page_start:<6} | New: {len(new_domains):<3} | Overlap: {overlap_count:<3} | NextToken: {bool(next_token):<1} | Total DB: {len(GLOBAL_SEEN)}")
+        elif domains:
+            print(f"[*] {label} | '{sort_direction}' | start={page_start:<6} | All {len(domains)} domains overlapped. Total DB: {len(GLOBAL_SEEN)}")
+        
+        if met_in_middle:
+            print(f"[*] {label} | '{sort_direction}' crossed the opposite channel. Stopping stream to save requests.")
+            return True # Exit this stream completely
+        if not next_token:
+            print(f"[-] {label} | '{sort_direction}' Stream stopping (no token).")
+            return True
+
+# In-flight requests are governed by an AIMD limiter between these bounds
+INITIAL_CONCURRENCY = 40
+MIN_CONCURRENCY = 4
+MAX_CONCURRENCY = 160
+
+# Global request pacing and the per-scan retry allowance
+REQUESTS_PER_SECOND = 20
+REQUEST_BURST = 40
+RETRY_BUDGET_RATIO = 0.2
+RETRY_BUDGET_FLOOR = 200
+
+# Single SQLite writer: pages queued before fetchers wait, and group-commit size / interval
+SINK_QUEUE_PAGES = 64
+SINK_BATCH_ROWS = 5000
+SINK_FLUSH_INTERVAL = 1.0
+
+# Shared sort-channel progress per (length, band) partition
+FRONTIERS = {}
+# Unfinished partitions per length, to know when a length's dedup table can be released
+PENDING_PARTITIONS = {}
 
-MAX_CONCURRENT_LENGTHS = 10 # 10 lengths * 4 channels = 40 parallel streams
+def finish_partition(length):
+    PENDING_PARTITIONS[length] -= 1
+    if RELEASE_FINISHED and PENDING_PARTITIONS[length] == 0:
+        GLOBAL_SEEN.release(length)
 
-async def process_length(length, channels, semaphore, db_path, scan_id):
-    async with semaphore:
-        print(f"\n[*] Starting extraction for Domain Length: {length}")
-        tasks = [fetch_stream(length, sort_dir, db_path, scan_id) for sort_dir in channels]
-        await asyncio.gather(*tasks)
-        print(f"\n[*] Finished Length {length}. Total unique so far: {len(GLOBAL_SEEN)}")
+async def process_partition(length, band, channels, checkpoints, pool, limiter, rate_limiter, retry_budget, sink):
+    states = {sort_dir: checkpoints.get((length, band, sort_dir), (1, "", False, False)) for sort_dir in channels}
+    # A channel finished before a resume means the partition was already covered; one that
+    # was abandoned proves nothing
+    frontier = FRONTIERS[(length, band)] = PartitionFrontier(
+        s for s, (_, _, done, abandoned) in states.items() if done and not abandoned)
+    tasks = []
+    for sort_dir, (start_index, next_token, done, abandoned) in states.items():
+        if abandoned:
+            # Its cursor is stale, so it starts over
+            start_index, next_token = 1, ""
+        if not done:
+            tasks.append(fetch_stream(length, band, sort_dir, frontier, pool, limiter, rate_limiter, retry_budget, sink,
+                                      start_index, next_token or ""))
+    finished = True
+    if tasks:
+        label = f"Length {length} ${band}" if band else f"Length {length}"
+        print(f"\n[*] Starting extraction for Domain {label}")
+        results = await asyncio.gather(*tasks)
+        print(f"\n[*] Finished {label}. Total unique so far: {len(GLOBAL_SEEN)} | Concurrency limit: {limiter.limit}")
+        finished = all(results)
+        if not finished and frontier.complete:
+            # The other channels covered what the abandoned ones missed
+            for sort_dir in channels:
+                await sink.put([], (length, band, sort_dir, 1, "", True, False))
+            finished = True
+    if finished:
+        finish_partition(length)
+    return finished
+
+async def plan_scan(db_path, scan_id, channels, pool, limiter, rate_limiter):
+    """Probes every length, splits the dense ones into price bands and persists the plan."""
+    print("[*] Planning: probing result counts per length...")
+    plan = await plan_partitions(functools.partial(probe_count, pool, limiter, rate_limiter))
+    partitions = [(length, band, stream_channels(count, channels, RECORDS_PER_PAGE)) for length, band, count in plan]
+    await save_plan(db_path, scan_id, partitions)
+
+    lengths = sorted({length for length, _, _ in partitions})
+    split = sorted({length for length, band, _ in partitions if band})
+    streams = sum(len(partition_channels) for _, _, partition_channels in partitions)
+    estimated = sum(count or 0 for _, _, count in plan)
+    print(f"[*] Plan: {len(partitions)} partitions / {streams} streams over {len(lengths)} non-empty lengths "
+          f"({len(ALL_LENGTHS) - len(lengths)} empty skipped), {len(split)} lengths split by price {split}, ~{estimated} domains estimated")
+    return partitions
 
 async def main():
     parser = argparse.ArgumentParser(description="HugeDomains Scraper -> SQLite")
     parser.add_argument("--db-path", default="hugedomains.db", help="Path to the SQLite database")
+    parser.add_argument("--parser", choices=list(ENGINES), help="HTML parser engine (default: fast)")
+    parser.add_argument("--stream-parse", action="store_true", help="Parse pages incrementally while they download")
+    parser.add_argument("--resume", type=int, metavar="SCAN_ID", help="Resume an interrupted scan from its stream checkpoints")
+    parser.add_argument("--release-finished", action="store_true", help="Free the dedup memory of each length once all its streams finish")
     args = parser.parse_args()
 
+    global PARSER_ENGINE, STREAM_PARSE, RELEASE_FINISHED
+    PARSER_ENGINE = args.parser
+    STREAM_PARSE = args.stream_parse
+    RELEASE_FINISHED = args.release_finished
+
     print("=== HugeDomains Fast Asynchronous Scraper (Multi-Length, 4-Channel) ===")
     print(f"[*] Proxy Configured: {PROXY_URL}")
     print(f"[*] Database Path: {args.db_path}")
-    print(f"[*] Concurrency: {MAX_CONCURRENT_LENGTHS} lengths at a time (total {MAX_CONCURRENT_LENGTHS * 4} streams)")
+    print(f"[*] Concurrency: adaptive, {INITIAL_CONCURRENCY} in-flight requests to start ({MIN_CONCURRENCY}-{MAX_CONCURRENCY})")
     
     # Initialize DB and get scan ID
-    scan_id = await get_or_create_scan(args.db_path)
-    print(f"[*] Starting Scan ID: {scan_id}")
+    scan_id = await get_or_create_scan(args.db_path, args.resume)
+    checkpoints = {}
+    if args.resume is not None:
+        checkpoints = await load_checkpoints(args.db_path, scan_id, GLOBAL_SEEN)
+        finished = sum(1 for cp in checkpoints.values() if cp[2] and not cp[3])
+        print(f"[*] Resuming Scan ID: {scan_id} ({len(GLOBAL_SEEN)} domains saved, {finished} streams finished, {len(checkpoints) - finished} in progress)")
+    else:
+        print(f"[*] Starting Scan ID: {scan_id}")
     
     channels = ["PriceAsc", "PriceDesc", "NameAsc", "NameDesc"]
-    semaphore = asyncio.Semaphore(MAX_CONCURRENT_LENGTHS)
-    
-    tasks = [process_length(length, channels, semaphore, args.db_path, scan_id) for length in range(1, 64)]
+    limiter = AdaptiveLimiter(INITIAL_CONCURRENCY, MIN_CONCURRENCY, MAX_CONCURRENCY)
+    pool = SessionPool(MAX_CONCURRENCY, PROXIES, HEADERS,
+                       rotate_every=SESSION_ROTATE_EVERY, max_age=SESSION_MAX_AGE)
+    rate_limiter = TokenBucket(REQUESTS_PER_SECOND, REQUEST_BURST)
+    retry_budget = RetryBudget(RETRY_BUDGET_RATIO, RETRY_BUDGET_FLOOR)
+    sink = SqliteSink(args.db_path, scan_id, SINK_QUEUE_PAGES, SINK_BATCH_ROWS, SINK_FLUSH_INTERVAL)
+    await sink.start()
     
-    # Process all lengths concurrently within the semaphore limit
-    await asyncio.gather(*tasks)
+    try:
+        # A resumed scan replays its persisted plan; a new one probes first
+        if checkpoints:
+            planned = {}
+            for length, band, sort_dir in checkpoints:
+                planned.setdefault((length, band), []).append(sort_dir)
+            partitions = [(length, band, [c for c in channels if c in sorts]) for (length, band), sorts in sorted(planned.items())]
+        else:
+            partitions = await plan_scan(args.db_path, scan_id, channels, pool, limiter, rate_limiter)
+            
+        for length, _, _ in partitions:
+            PENDING_PARTITIONS[length] = PENDING_PARTITIONS.get(length, 0) + 1
+        tasks = [asyncio.create_task(process_partition(length, band, partition_channels, checkpoints,
+                                                       pool, limiter, rate_limiter, retry_budget, sink))
+                 for length, band, partition_channels in partitions]
+        
+        # All streams run concurrently; the limiter decides how many requests are in flight
+        try:
+            results = await asyncio.gather(*tasks)
+        except RuntimeError:
+            if sink.error is None:
+                raise
+            # Nothing fetched from here on could be saved, so the whole scan stops
+            print("[!] Aborting scan: the SQLite writer failed.")
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            results = [False]
+    finally:
+        await pool.close()
+        await sink.close()
         
-    # Update scan status to complete
+    # Update scan status; streams that gave up can be picked up again with --resume
+    status = 'completed' if all(results) and sink.error is None else 'incomplete'
     async with aiosqlite.connect(args.db_path) as db:
         await db.execute(
-            "UPDATE scans SET total_extracted = ?, status = 'completed' WHERE id = ?",
-            (len(GLOBAL_SEEN), scan_id)
+            "UPDATE scans SET total_extracted = ?, status = ? WHERE id = ?",
+            (len(GLOBAL_SEEN), status, scan_id)
         )
         await db.commit()
+    if status == 'incomplete':
+        print(f"[!] Some streams did not finish. Continue with: --resume {scan_id}")
 
+    stats = pool.stats()
+    rows = duplicate_stats(FRONTIERS.values())
+    print(f"[*] Rows: {rows['rows_fetched']} fetched, {rows['duplicate_rows']} duplicates ({rows['duplicate_ratio']:.1%})")
+    dedup = GLOBAL_SEEN.stats()
+    print(f"[*] Dedup index: {dedup['domains']} domains, peak {dedup['peak_memory_bytes'] / 2**20:.1f} MiB ({dedup['bytes_per_domain']} bytes/domain), {dedup['released_partitions']} lengths released")
+    print(f"[*] Concurrency: final limit {limiter.limit} ({limiter.increases} increases, {limiter.decreases} decreases)")
+    retries = retry_budget.stats()
+    sink = sink.stats()
+    print(f"[*] Writes: {sink['rows_written']} rows from {sink['pages']} pages in {sink['commits']} commits ({sink['rows_per_commit']} rows/commit, {sink['insert_rows_per_s']} rows/s), fetchers waited on the writer {sink['backpressure_waits']}x")
+    print(f"[*] Retries: {retries['retries']} retries, {retries['wasted_requests']} wasted requests, avg retry-to-success {retries['avg_retry_to_success_s']}s (max {retries['max_retry_to_success_s']}s), budget exhausted {retries['budget_exhausted']}x")
+    print(f"[*] Sessions: {stats['requests']} requests over {stats['sessions_opened']} sessions (reuse {stats['reuse_ratio']:.1%}), rotations: {stats['rotations']}")
     print(f"\n=== Scraping Complete. Grand Total unique domains extracted: {len(GLOBAL_SEEN)} ===")
 
 if __name__ == "__main__":